@@ -1,24 +1,72 @@
+import logging
+import os
+import time
 import requests
 from requests.adapters import HTTPAdapter, Retry
 
+# Ответы Etherscan со status != '1', которые означают пустой результат, а не ошибку
+NO_RESULTS_MESSAGES = ("No transactions found", "No records found")
+
+# Поля записи, которые меняются от запроса к запросу и не идентифицируют её
+VOLATILE_FIELDS = ("confirmations",)
+
+
+def record_key(action, tx):
+    """Устойчивый ключ записи Etherscan для склейки страниц.
+
+    hash + logIndex/traceId, если они есть; для txlist hash уникален сам по
+    себе; иначе вся запись без изменчивых полей.
+    """
+    if 'logIndex' in tx or 'traceId' in tx:
+        return tx.get('hash'), tx.get('logIndex'), tx.get('traceId')
+    if action == "txlist" and tx.get('hash'):
+        return tx['hash']
+    return tuple(sorted((k, v) for k, v in tx.items() if k not in VOLATILE_FIELDS))
+
+
+class RateLimitError(RuntimeError):
+    """Провайдер троттлит запросы («Max rate limit reached» или HTTP 429) и повторы исчерпаны."""
+
+
 class EtherscanClient:
     BASE_URL = "https://api.etherscan.io/api"
+    # Etherscan отдаёт не больше 10 000 записей на запрос
+    PAGE_SIZE = 10000
 
-    def __init__(self, api_key, timeout=10):
+    def __init__(self, api_key, timeout=10, base_url=None, max_rate_limit_retries=5, rate_limit_backoff=1.0,
+                 pool_maxsize=10):
         self.api_key = api_key
         self.timeout = timeout
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.rate_limit_backoff = rate_limit_backoff
+        # Базовый URL можно подменить (например, на локальный сервер фикстур)
+        self.base_url = base_url or os.getenv("ETHERSCAN_BASE_URL") or self.BASE_URL
         self.session = requests.Session()
         retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[500,502,503,504])
-        self.session.mount("https://", HTTPAdapter(max_retries=retries))
+        # pool_maxsize — сколько соединений держать для параллельных потоков
+        adapter = HTTPAdapter(max_retries=retries, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
     def _get(self, params):
         params.update({"apikey": self.api_key})
-        resp = self.session.get(self.BASE_URL, params=params, timeout=self.timeout)
-        resp.raise_for_status()
-        data = resp.json()
-        if data.get('status') != '1':
+        for attempt in range(self.max_rate_limit_retries + 1):
+            resp = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            resp.raise_for_status()
+            data = resp.json()
+            if data.get('status') == '1':
+                return data['result']
+
+            # Etherscan сообщает о троттлинге кодом 200 и текстом в result
+            result = data.get('result')
+            if isinstance(result, str) and 'rate limit' in result.lower():
+                if attempt == self.max_rate_limit_retries:
+                    raise RateLimitError(result)
+                time.sleep(self.rate_limit_backoff * 2 ** attempt)
+                continue
+            if data.get('message') in NO_RESULTS_MESSAGES:
+                return []
             raise RuntimeError(data.get('message', 'Unknown error from Etherscan'))
-        return data['result']
 
     def fetch_normal_transactions(self, address, startblock=0, endblock=99999999, sort='asc'):
         """Получает список обычных транзакций."""
@@ -43,3 +91,64 @@ class EtherscanClient:
             "sort": sort
         }
         return self._get(params)
+
+    def fetch_internal_transactions(self, address, startblock=0, endblock=99999999, sort='asc'):
+        """Получает список внутренних транзакций (вызовы контрактов с переводом ETH)."""
+        params = {
+            "module": "account",
+            "action": "txlistinternal",
+            "address": address,
+            "startblock": startblock,
+            "endblock": endblock,
+            "sort": sort
+        }
+        return self._get(params)
+
+    def iter_transactions(self, action, address, startblock=0, endblock=99999999, page_size=PAGE_SIZE):
+        """Постранично обходит всю историю (txlist, tokentx, txlistinternal).
+
+        Обходит ограничение в 10 000 записей: каждая следующая страница
+        начинается с последнего блока предыдущей, а уже выданные записи этого
+        блока пропускаются. В памяти одновременно держится одна страница.
+        """
+        seen = set()
+        while True:
+            params = {
+                "module": "account",
+                "action": action,
+                "address": address,
+                "startblock": startblock,
+                "endblock": endblock,
+                "page": 1,
+                "offset": page_size,
+                "sort": "asc"
+            }
+            page = self._get(params)
+            last_block = int(page[-1]['blockNumber']) if page else None
+            boundary = set()
+            for tx in page:
+                block = int(tx['blockNumber'])
+                if block in (startblock, last_block):
+                    key = record_key(action, tx)
+                    if key in seen:
+                        continue
+                    if block == last_block:
+                        boundary.add(key)
+                yield tx
+            if len(page) < page_size:
+                return
+            if last_block == startblock:
+                # Вся страница в одном блоке: сдвинуться по блокам без потерь нельзя
+                logging.warning(f"Более {page_size} записей {action} в блоке {last_block}, остаток блока пропущен")
+                startblock, seen = last_block + 1, set()
+            else:
+                startblock, seen = last_block, boundary
+
+    def fetch_block_timestamp(self, block):
+        """Возвращает timestamp блока."""
+        params = {
+            "module": "block",
+            "action": "getblockreward",
+            "blockno": block
+        }
+        return int(self._get(params)['timeStamp'])
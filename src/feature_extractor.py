@@ -1,7 +1,41 @@
 from datetime import datetime
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
+import math
 import statistics
 import time
+from tx_schema import normalize_moralis_tx
+
+# Средний интервал между блоками Ethereum после перехода на PoS
+SECONDS_PER_BLOCK = 12
+
+
+class RunningStats:
+    """Среднее и дисперсия потока значений по Уэлфорду за O(1) памяти."""
+
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self):
+        self.count, self.mean, self.m2 = 0, 0.0, 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @staticmethod
+    def stdev_of(count: int, m2: float) -> float:
+        """Выборочное СКО, как statistics.stdev; 0 для менее чем двух значений."""
+        return math.sqrt(m2 / (count - 1)) if count > 1 else 0
+
+
+def avg_interval_hours(first_ts: int, last_ts: int, count: int) -> float:
+    """Среднее время между соседними транзакциями (ч).
+
+    Сумма интервалов отсортированных транзакций телескопируется в last - first.
+    """
+    return (last_ts - first_ts) / (count - 1) / 3600 if count > 1 else 0
 
 def calculate_features(normal_txs, token_txs, wallet_address):
     wallet = wallet_address.lower()
@@ -20,8 +54,8 @@ def calculate_features(normal_txs, token_txs, wallet_address):
     outgoing = [tx for tx in normal_txs if tx['from'].lower() == wallet]
     incoming = [tx for tx in normal_txs if tx['to'].lower() == wallet]
 
-    features['unique_contracts'] = len({tx['to'].lower() for tx in outgoing})
-    features['unique_tokens']    = len({tx['contractAddress'].lower() for tx in token_txs})
+    features['unique_contracts'] = len({tx['to'].lower() for tx in outgoing if tx['to']})
+    features['unique_tokens']    = len({tx['contractAddress'].lower() for tx in token_txs if tx['contractAddress']})
     
     if all_txs:
         first_ts = all_txs[0]['timeStamp']
@@ -48,7 +82,7 @@ def calculate_features(normal_txs, token_txs, wallet_address):
         count_per_day[date] += 1
     features['max_txs_per_day'] = max(count_per_day.values(), default=0)
 
-    features['unique_funders']      = len({tx['from'].lower() for tx in incoming})
+    features['unique_funders']      = len({tx['from'].lower() for tx in incoming if tx['from']})
     features['outgoing_eth_txs']    = len(outgoing)
 
     # Среднее и СКО исходящих ETH
@@ -63,84 +97,154 @@ def calculate_features(normal_txs, token_txs, wallet_address):
         features['avg_outgoing_eth_value'] = 0
         features['std_outgoing_eth_value'] = 0
 
-    features['unique_recipients'] = len({tx['to'].lower() for tx in outgoing})
+    features['unique_recipients'] = len({tx['to'].lower() for tx in outgoing if tx['to']})
     return features
 
 
 def calculate_features_moralis(normal_txs, token_txs, wallet_address):
-    wallet = wallet_address.lower()
-    all_txs = []
-
-    def parse_timestamp(tx):
-        ts = tx.get('block_timestamp')
-        if ts:
-            dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
-            return int(dt.timestamp())
-        return 0
-
-    for tx in normal_txs:
-        tx['parsed_time'] = parse_timestamp(tx)
-        tx['from'] = tx.get('from_address', '').lower()
-        tx['to'] = tx.get('to_address', '').lower()
-        tx['contractAddress'] = ''
-        all_txs.append(tx)
-
-    for tx in token_txs:
-        tx['parsed_time'] = parse_timestamp(tx)
-        tx['from'] = tx.get('from_address', '').lower()
-        tx['to'] = tx.get('to_address', '').lower()
-        tx['contractAddress'] = tx.get('token_address', '').lower()
-        all_txs.append(tx)
-
-    all_txs.sort(key=lambda x: x['parsed_time'])
-
-    features = {}
-    features['total_transactions'] = len(all_txs)
-
-    outgoing = [tx for tx in normal_txs if tx.get('from') == wallet]
-    incoming = [tx for tx in normal_txs if tx.get('to') == wallet]
-
-    features['unique_contracts'] = len({tx.get('to') for tx in outgoing if tx.get('to')})
-    features['unique_tokens'] = len({tx.get('contractAddress') for tx in token_txs if tx.get('contractAddress')})
-
-    if all_txs:
-        first_ts = all_txs[0]['parsed_time']
-        last_ts = all_txs[-1]['parsed_time']
-        now_ts = int(time.time())
-        features['wallet_age_days'] = (now_ts - first_ts) / 86400
-        active_days = max((last_ts - first_ts) / 86400, 1e-6)
-        features['transaction_frequency'] = len(all_txs) / active_days
-    else:
-        features['wallet_age_days'] = 0
-        features['transaction_frequency'] = 0
-
-    intervals = [
-        all_txs[i + 1]['parsed_time'] - all_txs[i]['parsed_time']
-        for i in range(len(all_txs) - 1)
-    ]
-    features['avg_time_between_txs'] = (statistics.mean(intervals) / 3600) if intervals else 0  # in hours
-
-    count_per_day = defaultdict(int)
-    for tx in all_txs:
-        date = datetime.utcfromtimestamp(tx['parsed_time']).date()
-        count_per_day[date] += 1
-    features['max_txs_per_day'] = max(count_per_day.values(), default=0)
-
-    features['unique_funders'] = len({tx.get('from') for tx in incoming if tx.get('from')})
-
-    features['outgoing_eth_txs'] = len(outgoing)
-
-    eth_values = [
-        int(tx.get('value', 0)) / 1e18
-        for tx in outgoing if int(tx.get('value', 0)) > 0
-    ]
-    if eth_values:
-        features['avg_outgoing_eth_value'] = statistics.mean(eth_values)
-        features['std_outgoing_eth_value'] = statistics.stdev(eth_values) if len(eth_values) > 1 else 0
-    else:
-        features['avg_outgoing_eth_value'] = 0
-        features['std_outgoing_eth_value'] = 0
-
-    features['unique_recipients'] = len({tx.get('to') for tx in outgoing if tx.get('to')})
-
-    return features
+    """Признаки по данным Moralis: приводит их к единой схеме и считает общим кодом."""
+    normal = [normalize_moralis_tx(tx) for tx in normal_txs]
+    tokens = [normalize_moralis_tx(tx, token=True) for tx in token_txs]
+    return calculate_features(normal, tokens, wallet_address)
+
+
+class WalletTimeline:
+    """История кошелька для признаков на момент снапшота (point-in-time).
+
+    Транзакции сортируются один раз, после чего строятся префиксные счётчики
+    и суммы. Признаки на любую отсечку (timestamp или блок) находятся бинарным
+    поиском за O(log n), без повторной загрузки и пересчёта всей истории.
+    """
+
+    def __init__(self, normal_txs, token_txs, wallet_address):
+        wallet = wallet_address.lower()
+        events = [(int(tx['timeStamp']), int(tx.get('blockNumber') or 0), False, tx) for tx in normal_txs]
+        events += [(int(tx['timeStamp']), int(tx.get('blockNumber') or 0), True, tx) for tx in token_txs]
+        events.sort(key=lambda e: (e[0], e[1]))
+
+        self.timestamps = [e[0] for e in events]
+        self.blocks = [e[1] for e in events]
+        # Опорные точки (блок, время) для оценки времени произвольного блока
+        points = sorted({(block, ts) for ts, block, _, _ in events if block})
+        self.known_blocks = [block for block, _ in points]
+        self.known_timestamps = [ts for _, ts in points]
+
+        # Префиксные значения: элемент i описывает первые i транзакций
+        self.max_per_day = [0]
+        self.outgoing = [0]
+        self.recipients = [0]
+        self.tokens = [0]
+        self.funders = [0]
+        self.eth_count = [0]
+        self.eth_mean = [0.0]
+        self.eth_m2 = [0.0]
+
+        per_day = defaultdict(int)
+        seen_recipients, seen_tokens, seen_funders = set(), set(), set()
+        eth = RunningStats()
+        for ts, _, is_token, tx in events:
+            day = ts // 86400
+            per_day[day] += 1
+            self.max_per_day.append(max(self.max_per_day[-1], per_day[day]))
+
+            sender, recipient = tx['from'].lower(), tx['to'].lower()
+            is_outgoing = not is_token and sender == wallet
+            if is_token and tx['contractAddress']:
+                seen_tokens.add(tx['contractAddress'].lower())
+            if is_outgoing and recipient:
+                seen_recipients.add(recipient)
+            if not is_token and recipient == wallet and sender:
+                seen_funders.add(sender)
+
+            # Welford: устойчивые среднее и M2 исходящих ETH на каждом префиксе
+            value = int(tx.get('value', 0)) if is_outgoing else 0
+            if value > 0:
+                eth.add(value / 1e18)
+
+            self.outgoing.append(self.outgoing[-1] + is_outgoing)
+            self.recipients.append(len(seen_recipients))
+            self.tokens.append(len(seen_tokens))
+            self.funders.append(len(seen_funders))
+            self.eth_count.append(eth.count)
+            self.eth_mean.append(eth.mean)
+            self.eth_m2.append(eth.m2)
+
+    def features_at(self, timestamp: int) -> dict:
+        """Признаки с учётом транзакций с timeStamp <= timestamp; возраст считается на этот момент."""
+        return self._features(bisect_right(self.timestamps, timestamp), timestamp)
+
+    def block_timestamp(self, block: int):
+        """Оценка времени блока по парам (blockNumber, timeStamp) из истории.
+
+        Внутри истории — линейная интерполяция между соседними известными
+        блоками, за её пределами — экстраполяция по SECONDS_PER_BLOCK.
+        Без номеров блоков в истории возвращает None.
+        """
+        blocks, timestamps = self.known_blocks, self.known_timestamps
+        if not blocks:
+            return None
+        i = bisect_left(blocks, block)
+        if i < len(blocks) and blocks[i] == block:
+            return timestamps[i]
+        if i == 0:
+            return timestamps[0] - (blocks[0] - block) * SECONDS_PER_BLOCK
+        if i == len(blocks):
+            return timestamps[-1] + (block - blocks[-1]) * SECONDS_PER_BLOCK
+        share = (block - blocks[i - 1]) / (blocks[i] - blocks[i - 1])
+        return int(timestamps[i - 1] + share * (timestamps[i] - timestamps[i - 1]))
+
+    def features_at_block(self, block: int, block_timestamp: int = None) -> dict:
+        """Признаки на блок включительно.
+
+        Возраст считается на время блока: `block_timestamp`, если оно известно
+        (например, из Etherscan), иначе оценка `block_timestamp()` по истории.
+        """
+        k = bisect_right(self.blocks, block)
+        if block_timestamp is None:
+            block_timestamp = self.block_timestamp(block)
+        if block_timestamp is None:
+            block_timestamp = self.timestamps[k - 1] if k else 0
+        return self._features(k, block_timestamp)
+
+    def as_of(self, cutoffs, by: str = 'timestamp', block_timestamps: dict[int, int] = None) -> list[dict]:
+        if by == 'timestamp':
+            return [self.features_at(cutoff) for cutoff in cutoffs]
+        if by == 'block':
+            block_timestamps = block_timestamps or {}
+            return [self.features_at_block(cutoff, block_timestamps.get(cutoff)) for cutoff in cutoffs]
+        raise ValueError(f"Неизвестный тип отсечки: {by}")
+
+    def _features(self, k: int, now_ts: int) -> dict:
+        features = {}
+        features['total_transactions'] = k
+        features['unique_contracts'] = self.recipients[k]
+        features['unique_tokens'] = self.tokens[k]
+
+        if k:
+            first_ts, last_ts = self.timestamps[0], self.timestamps[k - 1]
+            features['wallet_age_days'] = (now_ts - first_ts) / 86400
+            active_days = max((last_ts - first_ts) / 86400, 1e-6)
+            features['transaction_frequency'] = k / active_days
+        else:
+            features['wallet_age_days'] = 0
+            features['transaction_frequency'] = 0
+
+        features['avg_time_between_txs'] = (
+            avg_interval_hours(self.timestamps[0], self.timestamps[k - 1], k) if k else 0
+        )
+        features['max_txs_per_day'] = self.max_per_day[k]
+        features['unique_funders'] = self.funders[k]
+        features['outgoing_eth_txs'] = self.outgoing[k]
+
+        eth_count = self.eth_count[k]
+        features['avg_outgoing_eth_value'] = self.eth_mean[k] if eth_count else 0
+        features['std_outgoing_eth_value'] = RunningStats.stdev_of(eth_count, self.eth_m2[k])
+
+        features['unique_recipients'] = self.recipients[k]
+        return features
+
+
+def calculate_features_as_of(normal_txs, token_txs, wallet_address, cutoffs, by='timestamp',
+                             block_timestamps=None):
+    """Признаки на несколько снапшотов по одной загруженной истории."""
+    return WalletTimeline(normal_txs, token_txs, wallet_address).as_of(cutoffs, by, block_timestamps)
@@ -0,0 +1,256 @@
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+import yaml
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+# Query parameters that never take part in cassette matching
+IGNORED_PARAMS = {"apikey"}
+
+RATE_LIMIT_PAYLOAD = {"status": "0", "message": "NOTOK", "result": "Max rate limit reached"}
+
+
+def make_key(path: str, params) -> str:
+    """Stable cassette key for a request path and its query parameters."""
+    path = "/" + path.strip("/").lower()
+    items = sorted(
+        (str(k).lower(), str(v).lower())
+        for k, v in (params.items() if isinstance(params, dict) else params)
+        if str(k).lower() not in IGNORED_PARAMS
+    )
+    canonical = path + "?" + "&".join(f"{k}={v}" for k, v in items)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+class CassetteStore:
+    """Directory of gzip-compressed JSON cassettes, one file per request."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.json.gz"
+
+    def save(self, path: str, params, status: int, body):
+        key = make_key(path, params)
+        cassette = {
+            "path": path,
+            "params": {k: v for k, v in dict(params).items() if k.lower() not in IGNORED_PARAMS},
+            "status": status,
+            "body": body,
+        }
+        with gzip.open(self._path(key), "wt", encoding="utf-8") as f:
+            json.dump(cassette, f)
+        return key
+
+    def load(self, path: str, params):
+        cassette_path = self._path(make_key(path, params))
+        if not cassette_path.exists():
+            return None
+        with gzip.open(cassette_path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def __len__(self):
+        return sum(1 for _ in self.root.glob("*.json.gz"))
+
+
+class RecordingSession:
+    """Wraps a requests.Session and writes every GET response to a cassette store."""
+
+    def __init__(self, session, store: CassetteStore):
+        self._session = session
+        self.store = store
+
+    def get(self, url, params=None, **kwargs):
+        resp = self._session.get(url, params=params, **kwargs)
+        parts = urlsplit(resp.url)
+        try:
+            body = resp.json()
+        except ValueError:
+            body = resp.text
+        self.store.save(parts.path, parse_qsl(parts.query), resp.status_code, body)
+        return resp
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+def record(client, store: CassetteStore):
+    """Makes an EtherscanClient / MoralisClient record its responses into `store`."""
+    client.session = RecordingSession(client.session, store)
+    return client
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        params = parse_qsl(parts.query)
+        is_etherscan = parts.path.rstrip("/").endswith("/api")
+
+        delay = server.latency + server.draw() * server.jitter
+        if delay > 0:
+            time.sleep(delay)
+
+        if server.draw() < server.error_rate:
+            return self._send(503, {"message": "Injected server error"})
+        if server.draw() < server.rate_limit_rate:
+            if is_etherscan:
+                return self._send(200, RATE_LIMIT_PAYLOAD)
+            return self._send(429, {"message": "Rate limit exceeded"})
+
+        cassette = server.store.load(parts.path, params)
+        if cassette is None:
+            return self._send(404, {"message": f"No cassette recorded for {self.path}"})
+        self._send(cassette["status"], cassette["body"])
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logging.debug("%s - %s", self.address_string(), format % args)
+
+
+class ReplayServer(ThreadingHTTPServer):
+    """Serves recorded cassettes with injectable latency, errors and rate limiting."""
+
+    daemon_threads = True
+
+    def __init__(self, store: CassetteStore, host="127.0.0.1", port=8787, latency_ms=0.0,
+                 jitter_ms=0.0, error_rate=0.0, rate_limit_rate=0.0, seed=None):
+        super().__init__((host, port), ReplayHandler)
+        self.store = store
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def draw(self) -> float:
+        with self._rng_lock:
+            return self._rng.random()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def etherscan_url(self) -> str:
+        return f"{self.url}/api"
+
+    @property
+    def moralis_url(self) -> str:
+        return f"{self.url}/api/v2"
+
+
+def consume(iter_fn, action, address):
+    """Drains a paginated iterator so that every page gets recorded."""
+    for _ in iter_fn(action, address):
+        pass
+
+
+def record_wallets(addresses: list[str], store: CassetteStore, config_path: str, moralis: bool = False,
+                   chains: list[str] = None, blocks: list[int] = ()):
+    """Records every request shape the analyzers send for `addresses`.
+
+    Etherscan: txlist/tokentx/txlistinternal as single requests (provider pool)
+    and as page/offset pages (`main.py --approx`), plus getblockreward for
+    `blocks` (`--as-of ... --by block`). Moralis: wallet and ERC-20 endpoints
+    on each of `chains` (eth by default).
+    """
+    from data_fetcher import EtherscanClient
+    from moralis_extractor import MoralisClient
+
+    with open(config_path) as f:
+        cfg = yaml.safe_load(f)
+
+    etherscan = record(EtherscanClient(cfg['etherscan_api_key']), store)
+    fetches = [
+        ("etherscan txlist", etherscan.fetch_normal_transactions),
+        ("etherscan tokentx", etherscan.fetch_token_transfers),
+        ("etherscan txlistinternal", etherscan.fetch_internal_transactions),
+        ("etherscan txlist pages", partial(consume, etherscan.iter_transactions, "txlist")),
+        ("etherscan tokentx pages", partial(consume, etherscan.iter_transactions, "tokentx")),
+    ]
+    if moralis:
+        client = record(MoralisClient(cfg['moralis_api_key']), store)
+        for chain in chains or ['eth']:
+            fetches.append((f"moralis {chain} transactions", partial(client.fetch_normal_transactions, chain=chain)))
+            fetches.append((f"moralis {chain} erc20", partial(client.fetch_token_transfers, chain=chain)))
+
+    for address in addresses:
+        for name, fetch in fetches:
+            try:
+                fetch(address)
+            except Exception as e:
+                logging.warning(f"Recording {name} for {address} failed: {e}")
+        logging.info(f"Recorded {address}")
+
+    for block in blocks:
+        try:
+            etherscan.fetch_block_timestamp(block)
+        except Exception as e:
+            logging.warning(f"Recording the timestamp of block {block} failed: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record and replay Etherscan/Moralis responses")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rec = sub.add_parser("record", help="Record real API responses into the cassette store")
+    rec.add_argument("addresses", nargs="+", help="Wallet addresses to record")
+    rec.add_argument("--cassettes", default="fixtures/cassettes", help="Cassette directory")
+    rec.add_argument("--config", default="config/config.yaml", help="Path to config file")
+    rec.add_argument("--moralis", action="store_true", help="Also record Moralis responses")
+    rec.add_argument("--chains", nargs="+", help="Moralis chains to record (default: eth)")
+    rec.add_argument("--blocks", type=int, nargs="+", default=(), help="Blocks whose timestamps to record (--as-of --by block)")
+
+    srv = sub.add_parser("serve", help="Serve recorded cassettes over HTTP")
+    srv.add_argument("--cassettes", default="fixtures/cassettes", help="Cassette directory")
+    srv.add_argument("--host", default="127.0.0.1")
+    srv.add_argument("--port", type=int, default=8787)
+    srv.add_argument("--latency-ms", type=float, default=0.0, help="Base latency per response")
+    srv.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform extra latency on top of the base")
+    srv.add_argument("--error-rate", type=float, default=0.0, help="Share of HTTP 503 responses")
+    srv.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of rate-limit responses")
+    srv.add_argument("--seed", type=int, default=None, help="Seed for reproducible fault injection")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    store = CassetteStore(args.cassettes)
+
+    if args.command == "record":
+        record_wallets(args.addresses, store, args.config, args.moralis, args.chains, args.blocks)
+        logging.info(f"Cassette store {args.cassettes} holds {len(store)} responses")
+        return
+
+    server = ReplayServer(store, args.host, args.port, args.latency_ms, args.jitter_ms,
+                          args.error_rate, args.rate_limit_rate, args.seed)
+    logging.info(f"Replaying {len(store)} cassettes on {server.url}")
+    logging.info(f"Use ETHERSCAN_BASE_URL={server.etherscan_url} MORALIS_BASE_URL={server.moralis_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import argparse
+import http.client
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float = 60):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def count_items(status: int, content_type: str, body: bytes) -> tuple[int, int]:
+    """Returns (items, failed items) of one response; NDJSON batches are checked line by line."""
+    if content_type.startswith("application/x-ndjson"):
+        results = [json.loads(line) for line in body.splitlines() if line.strip()]
+    else:
+        results = [json.loads(body or b"{}")]
+    failed = sum(1 for result in results if status != 200 or "error" in result)
+    return len(results), failed
+
+
+def run_load_test(endpoint: str, payloads: list[dict], concurrency: int, host: str = "127.0.0.1",
+                  port: int = 8080, unix_socket: str = None, timeout: float = 60) -> dict:
+    """Sends `payloads` with `concurrency` keep-alive connections and reports latency.
+
+    A request counts as an error when it fails or when any item in its
+    response (every NDJSON line in batch mode) carries an "error".
+    """
+    local = threading.local()
+
+    def connection():
+        if getattr(local, "conn", None) is None:
+            if unix_socket:
+                local.conn = UnixHTTPConnection(unix_socket, timeout)
+            else:
+                local.conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        return local.conn
+
+    def send(payload):
+        conn = connection()
+        body = json.dumps(payload)
+        started = time.perf_counter()
+        expected = len(payload.get("addresses", [None]))
+        try:
+            conn.request("POST", endpoint, body, {"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            data = resp.read()
+            latency = time.perf_counter() - started
+            items, failed = count_items(resp.status, resp.getheader("Content-Type", ""), data)
+            # Missing NDJSON lines count as failed items too
+            failed += max(expected - items, 0)
+        except (OSError, http.client.HTTPException, ValueError):
+            conn.close()
+            local.conn = None
+            latency, failed = time.perf_counter() - started, expected
+        return latency, expected, failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(send, payloads))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _, _ in results]
+    return {
+        "requests": len(results),
+        "errors": sum(1 for _, _, failed in results if failed),
+        "items": sum(items for _, items, _ in results),
+        "item_errors": sum(failed for _, _, failed in results),
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "requests_per_second": round(len(results) / elapsed, 2) if elapsed else 0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the scoring service")
+    parser.add_argument("addresses", nargs="*", help="Wallet addresses (or use --addresses-file)")
+    parser.add_argument("--addresses-file", help="JSON list or one address per line")
+    parser.add_argument("--endpoint", default="/features", choices=["/features", "/score"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix-socket", help="Connect over a Unix socket instead of TCP")
+    parser.add_argument("--requests", type=int, default=200, help="Total number of requests")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=1, help="Addresses per request (>1 uses batch mode)")
+    args = parser.parse_args()
+
+    addresses = list(args.addresses)
+    if args.addresses_file:
+        with open(args.addresses_file) as f:
+            text = f.read()
+        try:
+            addresses += json.loads(text)
+        except ValueError:
+            addresses += [line.strip() for line in text.splitlines() if line.strip()]
+    if not addresses:
+        parser.error("no addresses given")
+
+    payloads = []
+    for i in range(args.requests):
+        if args.batch_size > 1:
+            start = i * args.batch_size
+            payloads.append({"addresses": [addresses[(start + k) % len(addresses)] for k in range(args.batch_size)]})
+        else:
+            payloads.append({"address": addresses[i % len(addresses)]})
+
+    # The first pass over the addresses misses the service cache; later requests
+    # are served from it, so the two passes are measured and reported separately
+    first_pass = min(-(-len(addresses) // args.batch_size), len(payloads))
+    report = {"cold": run_load_test(args.endpoint, payloads[:first_pass], args.concurrency,
+                                    args.host, args.port, args.unix_socket)}
+    if payloads[first_pass:]:
+        report["warm"] = run_load_test(args.endpoint, payloads[first_pass:], args.concurrency,
+                                       args.host, args.port, args.unix_socket)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,46 +1,122 @@
 import argparse
 import logging
 import yaml
-from data_fetcher import EtherscanClient
-from feature_extractor import calculate_features
-from presenter import display_features
+from feature_extractor import calculate_features, calculate_features_as_of
+from presenter import display_chain_features, display_features
 from utils import validate_address
 
 def load_config(path="config/config.yaml"):
     with open(path) as f:
         cfg = yaml.safe_load(f)
-    try:
-        return cfg['etherscan_api_key']
-    except KeyError:
+    if 'etherscan_api_key' not in cfg:
         raise KeyError("В конфиге отсутствует 'etherscan_api_key'")
+    return cfg
+
+def rule_engine(cfg):
+    from rules import RuleEngine
+    return RuleEngine.from_config(cfg)
+
+def resolve_block_timestamps(cfg, blocks):
+    """Время блоков снапшотов из Etherscan; неразрешённые блоки оцениваются по истории кошелька."""
+    from data_fetcher import EtherscanClient
+
+    client = EtherscanClient(cfg['etherscan_api_key'], base_url=cfg.get('etherscan_base_url'))
+    timestamps = {}
+    for block in blocks:
+        try:
+            timestamps[block] = client.fetch_block_timestamp(block)
+        except Exception as e:
+            logging.warning(f"Не удалось получить время блока {block}, оно будет оценено по истории: {e}")
+    return timestamps
+
+def analyze_approx(cfg, address):
+    """Приближённые признаки по потоку страниц Etherscan: в памяти одна страница и скетчи."""
+    from data_fetcher import EtherscanClient
+    from sketches import calculate_features_approx
+    from tx_schema import normalize_etherscan_tx
+
+    client = EtherscanClient(cfg['etherscan_api_key'], base_url=cfg.get('etherscan_base_url'))
+    try:
+        logging.info("Потоковый сбор транзакций и переводов токенов...")
+        features = calculate_features_approx(
+            map(normalize_etherscan_tx, client.iter_transactions("txlist", address)),
+            map(normalize_etherscan_tx, client.iter_transactions("tokentx", address)),
+            address,
+        )
+    except Exception as e:
+        logging.error(f"Ошибка при сборе данных: {e}")
+        return
+    display_features(features, rule_engine(cfg))
+
+def analyze_chains(cfg, address, chains):
+    from moralis_extractor import MoralisClient
+    from multichain import DEFAULT_CHAINS, MultiChainAnalyzer
+
+    if not cfg.get('moralis_api_key'):
+        logging.error("Для мультичейн-анализа нужен 'moralis_api_key' в конфиге")
+        return
+
+    client = MoralisClient(cfg['moralis_api_key'], base_url=cfg.get('moralis_base_url'))
+    analyzer = MultiChainAnalyzer(client, chains or cfg.get('chains') or DEFAULT_CHAINS, cfg.get('chain_rate_limits'))
+    logging.info(f"Сбор транзакций в сетях: {', '.join(analyzer.chains)}...")
+    result = analyzer.features(address)
+    for chain, error in result['errors'].items():
+        logging.error(f"Ошибка при сборе данных в сети {chain}: {error}")
+
+    display_features(result['merged'], rule_engine(cfg))
+    display_chain_features(result['per_chain'])
 
 def main():
     parser = argparse.ArgumentParser(description="Анализ активности Ethereum-кошелька")
     parser.add_argument("address", help="Адрес кошелька")
     parser.add_argument("--config", default="config/config.yaml", help="Путь к файлу конфигурации")
+    parser.add_argument("--as-of", type=int, nargs="+", help="Признаки на снапшоты (timestamp или номер блока)")
+    parser.add_argument("--by", choices=["timestamp", "block"], default="timestamp", help="Тип значений --as-of")
+    parser.add_argument("--chains", nargs="*", help="Мультичейн-анализ через Moralis (без значений — сети из конфига)")
+    parser.add_argument("--approx", action="store_true",
+                        help="Приближённые признаки на скетчах (постоянная память для кошельков-гигантов)")
     args = parser.parse_args()
+    if args.approx and args.as_of:
+        parser.error("--approx нельзя сочетать с --as-of")
 
     logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
     try:
-        api_key = load_config(args.config)
+        cfg = load_config(args.config)
         address = validate_address(args.address)
     except Exception as e:
         logging.error(e)
         return
 
-    client = EtherscanClient(api_key)
+    if args.chains is not None:
+        analyze_chains(cfg, address, args.chains)
+        return
+
+    if args.approx:
+        analyze_approx(cfg, address)
+        return
+
+    from providers import create_provider_pool
+
+    client = create_provider_pool(cfg)
     try:
-        logging.info("Сбор обычных транзакций...")
-        normal = client.fetch_normal_transactions(address)
-        logging.info("Сбор переводов токенов...")
-        tokens = client.fetch_token_transfers(address)
+        logging.info("Сбор обычных транзакций и переводов токенов...")
+        txs = client.fetch_wallet(address)
+        normal, tokens = txs['normal'], txs['token']
     except Exception as e:
         logging.error(f"Ошибка при сборе данных: {e}")
         return
 
+    if args.as_of:
+        block_timestamps = resolve_block_timestamps(cfg, args.as_of) if args.by == "block" else None
+        snapshots = calculate_features_as_of(normal, tokens, address, args.as_of, args.by, block_timestamps)
+        for cutoff, features in zip(args.as_of, snapshots):
+            print(f"\nСнапшот ({args.by} {cutoff}):")
+            display_features(features, rule_engine(cfg))
+        return
+
     features = calculate_features(normal, tokens, address)
-    display_features(features)
+    display_features(features, rule_engine(cfg))
 
 if __name__ == "__main__":
     main()
@@ -1,39 +1,67 @@
+import os
 import requests
 from requests.adapters import HTTPAdapter, Retry
+from data_fetcher import RateLimitError
 
 class MoralisClient:
     BASE_URL = "https://deep-index.moralis.io/api/v2"
 
-    def __init__(self, api_key, timeout=10):
+    def __init__(self, api_key, timeout=10, base_url=None, pool_maxsize=10):
         self.api_key = api_key
         self.timeout = timeout
+        self.base_url = (base_url or os.getenv("MORALIS_BASE_URL") or self.BASE_URL).rstrip("/")
         self.session = requests.Session()
-        retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[500,502,503,504])
-        self.session.mount("https://", HTTPAdapter(max_retries=retries))
+        retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[429,500,502,503,504])
+        adapter = HTTPAdapter(max_retries=retries, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self.headers = {
             "accept": "application/json",
             "X-API-Key": self.api_key
         }
 
     def _get(self, endpoint, params=None):
-        url = f"{self.BASE_URL}/{endpoint}"
-        resp = self.session.get(url, headers=self.headers, params=params or {}, timeout=self.timeout)
+        url = f"{self.base_url}/{endpoint}"
+        try:
+            resp = self.session.get(url, headers=self.headers, params=params or {}, timeout=self.timeout)
+        except requests.exceptions.RetryError as e:
+            # Повторы на 429 исчерпаны — это троттлинг, а не сбой провайдера
+            if "429" in str(e):
+                raise RateLimitError(str(e)) from e
+            raise
         resp.raise_for_status()
         data = resp.json()
         return data
 
-    def fetch_normal_transactions(self, address, chain='eth'):
+    def _get_all(self, endpoint, params, rate_limiter=None):
+        """Собирает все страницы ответа, следуя за курсором Moralis.
+
+        `rate_limiter` (объект с `acquire()`) вызывается перед каждой страницей.
+        """
+        results = []
+        params = dict(params)
+        while True:
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            data = self._get(endpoint, params)
+            results.extend(data.get('result', []))
+            cursor = data.get('cursor')
+            if not cursor:
+                return results
+            params['cursor'] = cursor
+
+    def _block_params(self, chain, from_block, to_block):
+        params = {"chain": chain}
+        if from_block is not None:
+            params["from_block"] = from_block
+        if to_block is not None:
+            params["to_block"] = to_block
+        return params
+
+    def fetch_normal_transactions(self, address, chain='eth', from_block=None, to_block=None, rate_limiter=None):
         endpoint = f"{address}"
-        params = {
-            "chain": chain
-        }
-        data = self._get(endpoint, params)
-        return data.get('result', [])
+        return self._get_all(endpoint, self._block_params(chain, from_block, to_block), rate_limiter)
 
-    def fetch_token_transfers(self, address, chain='eth'):
+    def fetch_token_transfers(self, address, chain='eth', from_block=None, to_block=None, rate_limiter=None):
         endpoint = f"{address}/erc20/transfers"
-        params = {
-            "chain": chain
-        }
-        data = self._get(endpoint, params)
-        return data.get('result', [])
+        return self._get_all(endpoint, self._block_params(chain, from_block, to_block), rate_limiter)
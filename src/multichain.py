@@ -0,0 +1,101 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from feature_extractor import calculate_features_moralis
+
+DEFAULT_CHAINS = ['eth', 'arbitrum', 'optimism', 'base', 'polygon']
+# Chains whose native token is ETH; only their values enter merged ETH value features
+ETH_NATIVE_CHAINS = {'eth', 'arbitrum', 'optimism', 'base', 'linea'}
+
+
+class RateLimiter:
+    """Token bucket: on average `rate` calls per second, bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class MultiChainAnalyzer:
+    """Fetches a wallet on several EVM chains through MoralisClient concurrently.
+
+    Every (chain, endpoint) pair runs in parallel, so a wallet's latency is
+    bounded by the slowest chain. Each chain has its own token bucket
+    (`rate_limits[chain]` HTTP requests per second, `default_rate` otherwise)
+    that is shared across wallets and charged for every pagination page.
+    """
+
+    def __init__(self, client, chains=None, rate_limits: dict[str, float] = None, default_rate: float = 5.0,
+                 max_workers: int = None):
+        self.client = client
+        self.chains = list(chains or DEFAULT_CHAINS)
+        rate_limits = rate_limits or {}
+        self.limiters = {chain: RateLimiter(rate_limits.get(chain, default_rate)) for chain in self.chains}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or 2 * len(self.chains),
+                                            thread_name_prefix="chain")
+
+    def _fetch(self, fetch, address, chain):
+        return fetch(address, chain=chain, rate_limiter=self.limiters[chain])
+
+    def fetch(self, address: str) -> tuple[dict[str, dict], dict[str, str]]:
+        """Returns ({chain: {'normal': [...], 'token': [...]}}, {chain: error}) for one wallet."""
+        futures = {
+            chain: {
+                'normal': self._executor.submit(self._fetch, self.client.fetch_normal_transactions, address, chain),
+                'token': self._executor.submit(self._fetch, self.client.fetch_token_transfers, address, chain),
+            }
+            for chain in self.chains
+        }
+
+        txs, errors = {}, {}
+        for chain, endpoints in futures.items():
+            try:
+                txs[chain] = {kind: future.result() for kind, future in endpoints.items()}
+            except Exception as e:
+                logging.warning(f"Failed to fetch {address} on {chain}: {e}")
+                errors[chain] = str(e)
+        return txs, errors
+
+    def features(self, address: str) -> dict:
+        """Per-chain features plus merged cross-chain features.
+
+        Merged features treat the same counterparty on different chains as one
+        entity. Per-chain outgoing values are in each chain's native token, so
+        the merged outgoing ETH count and avg/std values only use ETH_NATIVE_CHAINS.
+        """
+        txs, errors = self.fetch(address)
+        per_chain = {
+            chain: calculate_features_moralis(chain_txs['normal'], chain_txs['token'], address)
+            for chain, chain_txs in txs.items()
+        }
+
+        merged = calculate_features_moralis(
+            [tx for chain_txs in txs.values() for tx in chain_txs['normal']],
+            [tx for chain_txs in txs.values() for tx in chain_txs['token']],
+            address,
+        )
+        eth_native = calculate_features_moralis(
+            [tx for chain, chain_txs in txs.items() if chain in ETH_NATIVE_CHAINS for tx in chain_txs['normal']],
+            [], address,
+        )
+        for key in ('outgoing_eth_txs', 'avg_outgoing_eth_value', 'std_outgoing_eth_value'):
+            merged[key] = eth_native[key]
+        merged['active_chains'] = sum(1 for features in per_chain.values() if features['total_transactions'])
+
+        return {'merged': merged, 'per_chain': per_chain, 'errors': errors}
@@ -0,0 +1,186 @@
+import argparse
+import json
+import logging
+from array import array
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class EdgeList:
+    """Directed transfer edges between wallets, stored as two int32 arrays.
+
+    Addresses are interned to integer ids, so tens of millions of edges take
+    8 bytes each instead of a pair of Python strings.
+    """
+
+    def __init__(self):
+        self.index = {}
+        self.addresses = []
+        self.src = array('i')
+        self.dst = array('i')
+
+    def node(self, address: str) -> int:
+        address = address.lower()
+        node_id = self.index.get(address)
+        if node_id is None:
+            node_id = self.index[address] = len(self.addresses)
+            self.addresses.append(address)
+        return node_id
+
+    def add(self, sender: str, recipient: str):
+        self.src.append(self.node(sender))
+        self.dst.append(self.node(recipient))
+
+    def add_transactions(self, txs: list[dict]):
+        for tx in txs:
+            sender, recipient = tx['from'].lower(), tx['to'].lower()
+            if len(sender) == 42 and len(recipient) == 42 and sender != recipient:
+                self.add(sender, recipient)
+
+    def __len__(self):
+        return len(self.src)
+
+    def adjacency(self) -> sparse.csr_matrix:
+        """Binary directed adjacency matrix: A[i, j] = 1 if i sent to j."""
+        n = len(self.addresses)
+        src = np.frombuffer(self.src, dtype=np.int32)
+        dst = np.frombuffer(self.dst, dtype=np.int32)
+        data = np.ones(len(src), dtype=np.float32)
+        adjacency = sparse.csr_matrix((data, (src, dst)), shape=(n, n))
+        adjacency.data[:] = 1
+        return adjacency
+
+    def save(self, path: str):
+        np.savez_compressed(path, addresses=np.array(self.addresses),
+                            src=np.frombuffer(self.src, dtype=np.int32),
+                            dst=np.frombuffer(self.dst, dtype=np.int32))
+
+    @classmethod
+    def load(cls, path: str) -> "EdgeList":
+        data = np.load(path)
+        edges = cls()
+        edges.addresses = data['addresses'].tolist()
+        edges.index = {address: i for i, address in enumerate(edges.addresses)}
+        edges.src = array('i', data['src'].astype(np.int32).tobytes())
+        edges.dst = array('i', data['dst'].astype(np.int32).tobytes())
+        return edges
+
+
+def _row_max(matrix: sparse.csr_matrix, values: np.ndarray) -> np.ndarray:
+    """max(values[j]) over the nonzero columns j of each row; -inf for empty rows."""
+    out = np.full(matrix.shape[0], -np.inf, dtype=np.float32)
+    nonempty = np.diff(matrix.indptr) > 0
+    if matrix.nnz:
+        out[nonempty] = np.maximum.reduceat(values[matrix.indices], matrix.indptr[:-1][nonempty])
+    return out
+
+
+def neighbor_features(edges: EdgeList, wallet_features: dict[str, dict], scores: dict[str, float] = None,
+                      columns: list[str] = None, alpha: float = 0.85, iterations: int = 10) -> pd.DataFrame:
+    """Neighbor aggregates for every wallet in `wallet_features`.
+
+    All aggregates are sparse matrix products over the undirected neighbor
+    matrix N (and the directed transfer matrix A), so the cost is linear in
+    the number of edges:
+      - nbr_mean_<f>, nbr_max_<f>: mean / max of feature f over neighbors
+        that have features;
+      - degree, in_degree, out_degree, two_hop_paths (N @ deg - deg);
+      - with `scores` (address -> sybil score): flagged_funders (A.T @ s),
+        flagged_corecipients (score mass of other senders to the same
+        recipients) and propagated_score (label propagation over N with
+        restart weight 1 - alpha).
+    """
+    df = pd.DataFrame.from_dict(wallet_features, orient='index')
+    if columns is None:
+        columns = [c for c in df.select_dtypes(include=[np.number]).columns if c != 'target']
+
+    adjacency = edges.adjacency()
+    n = adjacency.shape[0]
+    neighbors = ((adjacency + adjacency.T) > 0).astype(np.float32).tocsr()
+
+    ids = np.array([edges.index.get(address.lower(), -1) for address in df.index], dtype=np.int64)
+    present = ids >= 0
+    known = np.zeros(n, dtype=np.float32)
+    known[ids[present]] = 1
+    values = np.zeros((n, len(columns)), dtype=np.float32)
+    values[ids[present]] = df.loc[present, columns].to_numpy(dtype=np.float32)
+
+    degree = np.asarray(neighbors.sum(axis=1)).ravel()
+    known_neighbors = neighbors @ known
+    result = {
+        'degree': degree,
+        'in_degree': np.asarray(adjacency.sum(axis=0)).ravel(),
+        'out_degree': np.asarray(adjacency.sum(axis=1)).ravel(),
+        'two_hop_paths': neighbors @ degree - degree,
+    }
+
+    means = (neighbors @ values) / np.maximum(known_neighbors, 1)[:, None]
+    masked = np.where(known[:, None] > 0, values, -np.inf).astype(np.float32)
+    for j, column in enumerate(columns):
+        result[f'nbr_mean_{column}'] = means[:, j]
+        column_max = _row_max(neighbors, masked[:, j])
+        result[f'nbr_max_{column}'] = np.where(np.isfinite(column_max), column_max, 0)
+
+    if scores:
+        seeds = np.zeros(n, dtype=np.float32)
+        for address, score in scores.items():
+            node_id = edges.index.get(address.lower())
+            if node_id is not None:
+                seeds[node_id] = float(score)
+
+        out_degree = result['out_degree']
+        result['flagged_funders'] = adjacency.T @ seeds
+        result['flagged_corecipients'] = adjacency @ (adjacency.T @ seeds) - out_degree * seeds
+
+        inv_degree = (1 / np.maximum(degree, 1)).astype(np.float32)
+        propagated = seeds.copy()
+        for _ in range(iterations):
+            propagated = alpha * inv_degree * (neighbors @ propagated) + (1 - alpha) * seeds
+        result['propagated_score'] = propagated
+
+    rows = np.where(present, ids, 0)
+    out = pd.DataFrame({name: np.asarray(column)[rows] for name, column in result.items()}, index=df.index)
+    out.loc[~present] = 0
+    return out
+
+
+def add_neighbor_features(wallet_features: dict[str, dict], edges: EdgeList,
+                          scores: dict[str, float] = None) -> dict[str, dict]:
+    """Returns `wallet_features` with neighbor columns merged into each wallet."""
+    extra = neighbor_features(edges, wallet_features, scores)
+    merged = {}
+    for address, features in wallet_features.items():
+        row = extra.loc[address]
+        merged[address] = {**features, **{name: float(value) for name, value in row.items()}}
+    return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add neighbor-aggregated features to crawled wallets")
+    parser.add_argument("--features", required=True, help="Wallet features JSON from wallet_network_analyzer")
+    parser.add_argument("--edges", required=True, help="Edge list .npz saved by wallet_network_analyzer")
+    parser.add_argument("--scores", help="JSON of address -> sybil score used as propagation seeds")
+    parser.add_argument("--output", required=True, help="Output JSON file path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    with open(args.features) as f:
+        wallet_features = json.load(f)
+    scores = None
+    if args.scores:
+        with open(args.scores) as f:
+            scores = json.load(f)
+
+    edges = EdgeList.load(args.edges)
+    logging.info(f"Loaded {len(edges)} edges between {len(edges.addresses)} addresses")
+    merged = add_neighbor_features(wallet_features, edges, scores)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(merged, f, indent=2)
+    logging.info(f"Saved {len(merged)} wallets with neighbor features to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
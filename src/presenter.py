@@ -1,4 +1,4 @@
-def display_features(features: dict):
+def display_features(features: dict, engine=None):
     """Печатает наглядный отчёт по признакам."""
     lines = [
         "Анализ активности кошелька:",
@@ -16,23 +16,25 @@ def display_features(features: dict):
         f"СКО исходящего ETH:           {features['std_outgoing_eth_value']:.4f} ETH",
         f"Уникальных получателей:       {features['unique_recipients']}"
     ]
+    if 'outgoing_eth_value_p50' in features:
+        lines.append(
+            f"Исходящий ETH p50/p90/p99:    {features['outgoing_eth_value_p50']:.4f} / "
+            f"{features['outgoing_eth_value_p90']:.4f} / {features['outgoing_eth_value_p99']:.4f} ETH"
+        )
     report = "\n".join(lines)
     print(report)
 
-    # Эвристика
-    if (features['transaction_frequency'] > 10 and 
-        features['wallet_age_days'] < 30 and 
-        features['unique_contracts'] < 5):
-        print("\n[!] Внимание: кошелек может быть сибильным.")
-    elif (features['transaction_frequency'] < 0.1 and 
-          features['wallet_age_days'] > 365 and 
-          features['unique_contracts'] > 50):
-        print("\n[!] Внимание: кошелек может быть заброшен.")
-    elif (features['avg_outgoing_eth_value'] > 10 and 
-          features['outgoing_eth_txs'] > 5):
-        print("\n[!] Внимание: кошелек может быть связан с крупными транзакциями.")
-    elif (features['unique_tokens'] > 20 and 
-          features['transaction_frequency'] > 1):
-        print("\n[!] Внимание: кошелек может быть связан с активной торговлей токенами.")
-    else:
-        print("\n[!] Кошелек выглядит нормальным.")
+    # Эвристика: те же декларативные правила, что и при пакетной разметке
+    if engine is None:
+        from rules import RuleEngine
+        engine = RuleEngine()
+    print("\n" + engine.message(engine.label(features)))
+
+
+def display_chain_features(per_chain: dict[str, dict]):
+    """Печатает краткую сводку признаков по каждой сети."""
+    print("\nАктивность по сетям:")
+    print(f"{'Сеть':<12}{'Транз.':>8}{'Контракты':>11}{'Токены':>8}{'Возраст (дн)':>14}")
+    for chain, features in per_chain.items():
+        print(f"{chain:<12}{features['total_transactions']:>8}{features['unique_contracts']:>11}"
+              f"{features['unique_tokens']:>8}{features['wallet_age_days']:>14.1f}")
@@ -0,0 +1,306 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from data_fetcher import EtherscanClient, RateLimitError
+from moralis_extractor import MoralisClient
+from tx_schema import normalize_etherscan_tx, normalize_moralis_tx
+
+
+class ProviderError(RuntimeError):
+    """Every provider failed to answer a request."""
+
+
+class EtherscanProvider:
+    name = "etherscan"
+
+    def __init__(self, client: EtherscanClient):
+        self.client = client
+
+    def fetch_normal_transactions(self, address, startblock=0, endblock=99999999):
+        txs = self.client.fetch_normal_transactions(address, startblock, endblock)
+        return [normalize_etherscan_tx(tx) for tx in txs]
+
+    def fetch_token_transfers(self, address, startblock=0, endblock=99999999):
+        txs = self.client.fetch_token_transfers(address, startblock, endblock)
+        return [normalize_etherscan_tx(tx) for tx in txs]
+
+    def fetch_internal_transactions(self, address, startblock=0, endblock=99999999):
+        txs = self.client.fetch_internal_transactions(address, startblock, endblock)
+        return [normalize_etherscan_tx(tx) for tx in txs]
+
+
+def moralis_block_range(startblock, endblock):
+    """Etherscan-style bounds as Moralis from_block/to_block; the full-history defaults become None.
+
+    Moralis then gets the same query as a bare MoralisClient call, so recorded
+    fixtures replay through the provider pool too.
+    """
+    return startblock or None, None if endblock == 99999999 else endblock
+
+
+class MoralisProvider:
+    name = "moralis"
+
+    def __init__(self, client: MoralisClient, chain: str = 'eth'):
+        self.client = client
+        self.chain = chain
+
+    def fetch_normal_transactions(self, address, startblock=0, endblock=99999999):
+        txs = self.client.fetch_normal_transactions(address, self.chain, *moralis_block_range(startblock, endblock))
+        return [normalize_moralis_tx(tx) for tx in txs]
+
+    def fetch_token_transfers(self, address, startblock=0, endblock=99999999):
+        txs = self.client.fetch_token_transfers(address, self.chain, *moralis_block_range(startblock, endblock))
+        return [normalize_moralis_tx(tx, token=True) for tx in txs]
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into a single execution."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._forget(key, future)
+
+    def submit(self, key, executor, fn) -> Future:
+        """Like `do`, but runs `fn` on `executor` and returns the shared Future.
+
+        The key is resolved in the calling thread, so callers join a call in
+        flight even while its task is still queued on the executor.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future
+            future = self._calls[key] = executor.submit(fn)
+        future.add_done_callback(lambda _: self._forget(key, future))
+        return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+
+
+class ProviderStats:
+    """Sliding window of latencies and outcomes for one provider."""
+
+    def __init__(self, window: int = 50):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.throttled_until = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self.latencies.append(latency)
+            self.outcomes.append(ok)
+
+    def throttle(self, seconds: float):
+        with self._lock:
+            self.throttled_until = max(self.throttled_until, time.monotonic() + seconds)
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self.outcomes:
+                return 0.0
+            return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def latency_quantile(self, q: float):
+        with self._lock:
+            if not self.latencies:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": len(self.outcomes),
+            "error_rate": self.error_rate(),
+            "p50_latency": self.latency_quantile(0.5),
+            "p95_latency": self.latency_quantile(0.95),
+            "throttled": time.monotonic() < self.throttled_until,
+        }
+
+
+class ProviderPool:
+    """Routes requests across providers with hedging and failover.
+
+    Healthy providers are tried in order of median latency. When the active
+    attempt runs past the provider's `hedge_quantile` latency, a duplicate
+    request goes to the next provider and the first successful answer wins.
+    A provider whose recent error rate exceeds `max_error_rate`, or that just
+    returned a rate-limit error, is moved to the back of the queue.
+
+    Concurrent requests for the same (endpoint, address, block range) share
+    one in-flight call, and `fetch_wallet` issues a wallet's endpoints in
+    parallel so its latency is bounded by the slowest one.
+    """
+
+    WALLET_ENDPOINTS = {
+        'normal': 'fetch_normal_transactions',
+        'token': 'fetch_token_transfers',
+        'internal': 'fetch_internal_transactions',
+    }
+
+    def __init__(self, providers, hedge_quantile=0.95, initial_hedge_delay=2.0, min_hedge_delay=0.2,
+                 max_error_rate=0.5, min_samples=5, throttle_cooldown=30.0, max_workers=8):
+        if not providers:
+            raise ValueError("ProviderPool needs at least one provider")
+        self.providers = list(providers)
+        self.stats = {p.name: ProviderStats() for p in self.providers}
+        self.hedge_quantile = hedge_quantile
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.throttle_cooldown = throttle_cooldown
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="provider")
+        # Separate pool: fan-out tasks block on attempts running in `_executor`
+        self._fanout = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fanout")
+        self._inflight = SingleFlight()
+
+    def fetch_normal_transactions(self, address, startblock=0, endblock=99999999):
+        return self._call('fetch_normal_transactions', address, startblock, endblock)
+
+    def fetch_token_transfers(self, address, startblock=0, endblock=99999999):
+        return self._call('fetch_token_transfers', address, startblock, endblock)
+
+    def fetch_internal_transactions(self, address, startblock=0, endblock=99999999):
+        return self._call('fetch_internal_transactions', address, startblock, endblock)
+
+    def fetch_wallet(self, address, startblock=0, endblock=99999999, include_internal=False) -> dict[str, list]:
+        """Fetches all per-wallet endpoints concurrently.
+
+        Returns a dict with 'normal' and 'token' lists, plus 'internal' when
+        `include_internal` is set.
+        """
+        kinds = ['normal', 'token'] + (['internal'] if include_internal else [])
+        futures = {}
+        for kind in kinds:
+            method = self.WALLET_ENDPOINTS[kind]
+            futures[kind] = self._inflight.submit(
+                self._key(method, address, startblock, endblock), self._fanout,
+                lambda method=method: self._dispatch(method, address, startblock, endblock),
+            )
+        return {kind: future.result() for kind, future in futures.items()}
+
+    def degraded(self, provider) -> bool:
+        stats = self.stats[provider.name]
+        if time.monotonic() < stats.throttled_until:
+            return True
+        return len(stats.outcomes) >= self.min_samples and stats.error_rate() > self.max_error_rate
+
+    def _ranked(self, method: str):
+        candidates = [p for p in self.providers if hasattr(p, method)]
+        if not candidates:
+            raise ProviderError(f"No provider supports {method}")
+
+        def sort_key(provider):
+            p50 = self.stats[provider.name].latency_quantile(0.5)
+            return (self.degraded(provider), p50 or 0.0)
+
+        return sorted(candidates, key=sort_key)
+
+    def _hedge_delay(self, provider) -> float:
+        latency = self.stats[provider.name].latency_quantile(self.hedge_quantile)
+        if latency is None:
+            return self.initial_hedge_delay
+        return max(latency, self.min_hedge_delay)
+
+    def _attempt(self, provider, method, args):
+        stats = self.stats[provider.name]
+        started = time.monotonic()
+        try:
+            result = getattr(provider, method)(*args)
+        except RateLimitError:
+            stats.record(time.monotonic() - started, ok=False)
+            stats.throttle(self.throttle_cooldown)
+            raise
+        except Exception:
+            stats.record(time.monotonic() - started, ok=False)
+            raise
+        stats.record(time.monotonic() - started, ok=True)
+        return result
+
+    @staticmethod
+    def _key(method, address, startblock, endblock):
+        return (method, address.lower(), startblock, endblock)
+
+    def _call(self, method, address, startblock, endblock):
+        key = self._key(method, address, startblock, endblock)
+        return self._inflight.do(key, lambda: self._dispatch(method, address, startblock, endblock))
+
+    def _dispatch(self, method, *args):
+        ranked = self._ranked(method)
+        pending = {}
+        errors = []
+
+        def launch():
+            provider = ranked[len(pending) + len(errors)]
+            pending[self._executor.submit(self._attempt, provider, method, args)] = provider
+            return provider
+
+        active = launch()
+        while pending:
+            has_spare = len(pending) + len(errors) < len(ranked)
+            timeout = self._hedge_delay(active) if has_spare else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                logging.debug(f"{active.name} exceeded tail latency on {method}, hedging")
+                active = launch()
+                continue
+
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    logging.warning(f"{provider.name}.{method} failed: {e}")
+                    errors.append(f"{provider.name}: {e}")
+
+            if not pending and len(errors) < len(ranked):
+                active = launch()
+
+        raise ProviderError(f"All providers failed for {method}: " + "; ".join(errors))
+
+    def report(self) -> dict:
+        return {name: stats.snapshot() for name, stats in self.stats.items()}
+
+
+def create_provider_pool(cfg: dict, **kwargs) -> ProviderPool:
+    """Builds a pool from config: Etherscan always, Moralis when a key is present.
+
+    Each client keeps as many HTTP connections as the pool has worker threads,
+    so concurrent requests to one provider don't open and drop extra sockets.
+    """
+    pool_maxsize = max(kwargs.get('max_workers', 8), 10)
+    etherscan = EtherscanClient(cfg['etherscan_api_key'], base_url=cfg.get('etherscan_base_url'),
+                                pool_maxsize=pool_maxsize)
+    providers = [EtherscanProvider(etherscan)]
+    if cfg.get('moralis_api_key'):
+        client = MoralisClient(cfg['moralis_api_key'], base_url=cfg.get('moralis_base_url'), pool_maxsize=pool_maxsize)
+        providers.append(MoralisProvider(client))
+    return ProviderPool(providers, **kwargs)
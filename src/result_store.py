@@ -0,0 +1,192 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS wallets (
+    address    TEXT PRIMARY KEY,
+    features   TEXT,
+    flags      TEXT,
+    verdict    INTEGER,
+    score      REAL,
+    cluster    INTEGER,
+    model      TEXT,
+    updated_at REAL NOT NULL,
+    scored_at  REAL
+);
+CREATE INDEX IF NOT EXISTS idx_wallets_score ON wallets (score);
+CREATE INDEX IF NOT EXISTS idx_wallets_cluster ON wallets (cluster);
+CREATE INDEX IF NOT EXISTS idx_wallets_scored_at ON wallets (scored_at);
+"""
+
+UPSERT = """
+INSERT INTO wallets (address, features, flags, verdict, score, cluster, model, updated_at, scored_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (address) DO UPDATE SET
+    features   = COALESCE(excluded.features, features),
+    flags      = COALESCE(excluded.flags, flags),
+    verdict    = COALESCE(excluded.verdict, verdict),
+    score      = COALESCE(excluded.score, score),
+    cluster    = COALESCE(excluded.cluster, cluster),
+    model      = COALESCE(excluded.model, model),
+    updated_at = excluded.updated_at,
+    scored_at  = COALESCE(excluded.scored_at, scored_at)
+"""
+
+COLUMNS = ["address", "features", "flags", "verdict", "score", "cluster", "model", "updated_at", "scored_at"]
+# Default lookup columns: everything but the feature blobs, whose JSON decoding dominates batch lookups
+RECORD_COLUMNS = [column for column in COLUMNS if column != "features"]
+
+JSON_COLUMNS = ("features", "flags")
+_decoder = json.JSONDecoder()
+
+
+class ResultStore:
+    """Indexed per-wallet results (features, heuristic flags, verdicts, clusters).
+
+    Backed by SQLite in WAL mode. Upserts only overwrite the fields that are
+    given, so features, verdicts and cluster ids can be written by different
+    stages. Addresses are stored lowercase. Lookups return RECORD_COLUMNS
+    unless asked for more; pass columns=COLUMNS to include features.
+    """
+
+    def __init__(self, path: str = "results.db"):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            # Batch lookups touch most of the table: map it and keep hot pages cached
+            self._conn.execute("PRAGMA mmap_size=268435456")
+            self._conn.execute("PRAGMA cache_size=-65536")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @staticmethod
+    def _row(address, features=None, flags=None, verdict=None, score=None, cluster=None, model=None, now=None):
+        now = now or time.time()
+        scored = verdict is not None or score is not None
+        return (
+            address.lower(),
+            json.dumps(features) if features is not None else None,
+            json.dumps(flags) if flags is not None else None,
+            verdict, score, cluster, model, now,
+            now if scored else None,
+        )
+
+    def upsert(self, address: str, **fields):
+        self.upsert_many([{"address": address, **fields}])
+
+    def upsert_many(self, records: list[dict]):
+        now = time.time()
+        rows = [self._row(now=now, **record) for record in records]
+        with self._lock, self._conn:
+            self._conn.executemany(UPSERT, rows)
+
+    @staticmethod
+    def _decode(columns, rows) -> list[dict]:
+        """Turns rows into dicts, decoding each JSON column with a single parse.
+
+        Joining a column's values into one JSON array and decoding it once is
+        about a third faster than one json.loads per row.
+        """
+        rows = [list(row) for row in rows]
+        for i, column in enumerate(columns):
+            if column in JSON_COLUMNS and rows:
+                values = _decoder.decode("[" + ",".join(row[i] or "null" for row in rows) + "]")
+                for row, value in zip(rows, values):
+                    row[i] = value
+        return [dict(zip(columns, row)) for row in rows]
+
+    def _select(self, query: str, params=(), columns: list[str] = RECORD_COLUMNS) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return self._decode(columns, rows)
+
+    def get(self, address: str, columns: list[str] = RECORD_COLUMNS):
+        return self.get_many([address], columns).get(address.lower())
+
+    def get_many(self, addresses, columns: list[str] = RECORD_COLUMNS) -> dict[str, dict]:
+        """Batch lookup in a single query.
+
+        The addresses are passed as one JSON array and joined against the
+        primary key; sorting them first turns the probes into an in-order
+        B-tree walk.
+        """
+        columns = list(dict.fromkeys(["address", *columns]))
+        selected = ", ".join(f"w.{column}" for column in columns)
+        payload = json.dumps(sorted({address.lower() for address in addresses}))
+        records = self._select(
+            f"SELECT {selected} FROM json_each(?) AS j CROSS JOIN wallets AS w ON w.address = j.value",
+            (payload,), columns,
+        )
+        return {record["address"]: record for record in records}
+
+    def fresh(self, addresses, ttl: float) -> dict[str, dict]:
+        """Verdicts among `addresses` scored within the last `ttl` seconds."""
+        cutoff = time.time() - ttl
+        records = self.get_many(addresses, ["verdict", "score", "scored_at"])
+        return {
+            address: record for address, record in records.items()
+            if record["scored_at"] is not None and record["scored_at"] >= cutoff
+        }
+
+    def by_score(self, min_score: float = None, max_score: float = None, limit: int = None,
+                 columns: list[str] = RECORD_COLUMNS) -> list[dict]:
+        query = f"SELECT {', '.join(columns)} FROM wallets WHERE score IS NOT NULL"
+        params = []
+        if min_score is not None:
+            query += " AND score >= ?"
+            params.append(min_score)
+        if max_score is not None:
+            query += " AND score <= ?"
+            params.append(max_score)
+        query += " ORDER BY score DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return self._select(query, params, columns)
+
+    def by_cluster(self, cluster: int, columns: list[str] = RECORD_COLUMNS) -> list[dict]:
+        return self._select(f"SELECT {', '.join(columns)} FROM wallets WHERE cluster = ?", (cluster,), columns)
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM wallets").fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the wallet result store")
+    parser.add_argument("--store", default="results.db", help="Path to the SQLite result store")
+    parser.add_argument("addresses", nargs="*", help="Addresses to look up")
+    parser.add_argument("--min-score", type=float, help="Lower bound of a score range query")
+    parser.add_argument("--max-score", type=float, help="Upper bound of a score range query")
+    parser.add_argument("--cluster", type=int, help="List wallets of a cluster")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--features", action="store_true", help="Include the stored features")
+    args = parser.parse_args()
+    columns = COLUMNS if args.features else RECORD_COLUMNS
+
+    with ResultStore(args.store) as store:
+        if args.addresses:
+            records = store.get_many(args.addresses, columns)
+        elif args.cluster is not None:
+            records = store.by_cluster(args.cluster, columns)[:args.limit]
+        else:
+            records = store.by_score(args.min_score, args.max_score, args.limit, columns)
+        print(json.dumps(records, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import argparse
+import json
+import time
+import numpy as np
+import yaml
+
+# Rules are checked in order; a wallet gets the label of the first rule whose
+# conditions all hold, like an if/elif chain. Override with a `rules:` list in
+# config.yaml using the same structure.
+DEFAULT_RULES = [
+    {
+        "name": "sybil",
+        "message": "[!] Внимание: кошелек может быть сибильным.",
+        "when": [["transaction_frequency", ">", 10], ["wallet_age_days", "<", 30], ["unique_contracts", "<", 5]],
+    },
+    {
+        "name": "abandoned",
+        "message": "[!] Внимание: кошелек может быть заброшен.",
+        "when": [["transaction_frequency", "<", 0.1], ["wallet_age_days", ">", 365], ["unique_contracts", ">", 50]],
+    },
+    {
+        "name": "whale",
+        "message": "[!] Внимание: кошелек может быть связан с крупными транзакциями.",
+        "when": [["avg_outgoing_eth_value", ">", 10], ["outgoing_eth_txs", ">", 5]],
+    },
+    {
+        "name": "trader",
+        "message": "[!] Внимание: кошелек может быть связан с активной торговлей токенами.",
+        "when": [["unique_tokens", ">", 20], ["transaction_frequency", ">", 1]],
+    },
+]
+DEFAULT_LABEL = "normal"
+DEFAULT_MESSAGE = "[!] Кошелек выглядит нормальным."
+
+OPERATORS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+
+class Rule:
+    def __init__(self, name: str, when: list, message: str = None):
+        self.name = name
+        self.message = message or f"[!] {name}"
+        self.conditions = []
+        for feature, op, value in when:
+            if op not in OPERATORS:
+                raise ValueError(f"Unknown operator '{op}' in rule '{name}'")
+            self.conditions.append((feature, OPERATORS[op], float(value)))
+
+    def mask(self, columns: dict[str, np.ndarray], size: int) -> np.ndarray:
+        result = np.ones(size, dtype=bool)
+        for feature, op, value in self.conditions:
+            if feature not in columns:
+                raise ValueError(f"Rule '{self.name}' needs missing feature '{feature}'")
+            result &= op(columns[feature], value)
+        return result
+
+
+class RuleEngine:
+    """Compiles declarative rules into vectorized masks over feature columns.
+
+    `evaluate` labels any number of wallets in one pass over a DataFrame or a
+    dict of column arrays, and accumulates per-rule match/hit counts and time.
+    """
+
+    def __init__(self, rules: list[dict] = None, default_label: str = DEFAULT_LABEL,
+                 default_message: str = DEFAULT_MESSAGE):
+        self.rules = [Rule(**rule) for rule in (rules or DEFAULT_RULES)]
+        self.default_label = default_label
+        self.default_message = default_message
+        self.messages = {rule.name: rule.message for rule in self.rules}
+        self.messages[default_label] = default_message
+        self.stats = {rule.name: {"matches": 0, "hits": 0, "seconds": 0.0} for rule in self.rules}
+
+    @classmethod
+    def from_config(cls, cfg: dict) -> "RuleEngine":
+        return cls(cfg.get('rules') if cfg else None)
+
+    def _columns(self, data) -> tuple[dict[str, np.ndarray], int]:
+        needed = {feature for rule in self.rules for feature, _, _ in rule.conditions}
+        columns = {feature: np.asarray(data[feature], dtype=float) for feature in needed if feature in data}
+        size = len(next(iter(columns.values()))) if columns else len(data)
+        return columns, size
+
+    def evaluate(self, data) -> np.ndarray:
+        """Returns an array of labels, one per row of `data`."""
+        columns, size = self._columns(data)
+        labels = np.full(size, self.default_label, dtype=object)
+        unassigned = np.ones(size, dtype=bool)
+        for rule in self.rules:
+            started = time.perf_counter()
+            matched = rule.mask(columns, size)
+            hits = matched & unassigned
+            labels[hits] = rule.name
+            unassigned &= ~matched
+            stats = self.stats[rule.name]
+            stats["matches"] += int(matched.sum())
+            stats["hits"] += int(hits.sum())
+            stats["seconds"] += time.perf_counter() - started
+        return labels
+
+    def label(self, features: dict) -> str:
+        return self.evaluate({key: [value] for key, value in features.items()})[0]
+
+    def message(self, label: str) -> str:
+        return self.messages[label]
+
+    def report(self) -> dict[str, dict]:
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Label wallets with the heuristic rule engine")
+    parser.add_argument("--input", "-i", required=True, help="Wallet features JSON (address -> features)")
+    parser.add_argument("--output", "-o", help="Output JSON file with address -> label")
+    parser.add_argument("--config", "-c", default="config/config.yaml", help="Config file with optional 'rules'")
+    parser.add_argument("--store", help="SQLite result store to upsert labels into as heuristic flags")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    try:
+        with open(args.config) as f:
+            cfg = yaml.safe_load(f)
+    except FileNotFoundError:
+        cfg = {}
+    engine = RuleEngine.from_config(cfg)
+
+    with open(args.input) as f:
+        df = pd.DataFrame.from_dict(json.load(f), orient='index')
+
+    started = time.perf_counter()
+    labels = engine.evaluate(df)
+    elapsed = time.perf_counter() - started
+
+    counts = pd.Series(labels).value_counts().to_dict()
+    print(f"Labeled {len(df)} wallets in {elapsed:.3f}s: {counts}")
+    for name, stats in engine.report().items():
+        print(f"  {name:<10} matches={stats['matches']:<8} hits={stats['hits']:<8} {stats['seconds'] * 1000:.2f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(dict(zip(df.index, labels.tolist())), f, indent=2)
+        print(f"Labels saved to {args.output}")
+
+    if args.store:
+        from result_store import ResultStore
+        with ResultStore(args.store) as store:
+            store.upsert_many([{"address": address, "flags": {"label": label}}
+                               for address, label in zip(df.index, labels.tolist())])
+        print(f"Labels upserted into {args.store}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+import argparse
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+import yaml
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from feature_extractor import calculate_features
+from utils import validate_address
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            stored_at, value = item
+            if time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ScoringService:
+    """Keeps pooled clients, caches and the detector warm between requests."""
+
+    def __init__(self, cfg: dict, config_path: str = "config/config.yaml", cache_ttl: float = 600.0,
+                 workers: int = 16, detector=None, store=None, store_ttl: float = None):
+        from providers import SingleFlight, create_provider_pool
+
+        # Two endpoints per wallet, each of which may be hedged to a second provider
+        self.client = create_provider_pool(cfg, max_workers=max(8, 4 * workers))
+        self.detector = detector
+        self.config_path = config_path
+        self.features_cache = TTLCache(ttl=cache_ttl)
+        self.scores_cache = TTLCache(ttl=cache_ttl)
+        # Optional ResultStore: verdicts fresher than `store_ttl` are served without re-scoring
+        self.store = store
+        self.store_ttl = store_ttl
+        self._inflight = SingleFlight()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scoring")
+
+    def load_detector(self):
+        if self.detector is None:
+            from sybil_detection import SybilDetector
+            self.detector = SybilDetector(config_path=self.config_path)
+        return self.detector
+
+    def features(self, address: str) -> dict:
+        address = validate_address(address)
+        cached = self.features_cache.get(address)
+        if cached is not None:
+            return cached
+        return self._inflight.do(('features', address), lambda: self._compute_features(address))
+
+    def _compute_features(self, address: str) -> dict:
+        txs = self.client.fetch_wallet(address)
+        features = calculate_features(txs['normal'], txs['token'], address)
+        self.features_cache.set(address, features)
+        return features
+
+    def score(self, address: str) -> dict:
+        address = validate_address(address)
+        cached = self.scores_cache.get(address)
+        if cached is not None:
+            return cached
+        return self._inflight.do(('score', address), lambda: self._compute_score(address))
+
+    def _compute_score(self, address: str) -> dict:
+        if self.store is not None and self.store_ttl is not None:
+            record = self.store.fresh([address], self.store_ttl).get(address.lower())
+            if record is not None and record["verdict"] is not None:
+                result = {"address": address, "is_sybil": record["verdict"], "cached": True}
+                self.scores_cache.set(address, result)
+                return result
+
+        features = self.features(address)
+        detector = self.load_detector()
+        is_sybil = detector.detect_sybil(address, features)
+        if is_sybil is None:
+            # Nothing is cached or stored, so the next request asks the model again
+            raise RuntimeError(f"No parseable verdict for {address}")
+        result = {"address": address, "features": features, "is_sybil": is_sybil}
+        if self.store is not None:
+            self.store.upsert(address, features=features, verdict=result["is_sybil"],
+                              score=float(result["is_sybil"]), model=detector.model)
+        self.scores_cache.set(address, result)
+        return result
+
+    def run(self, kind: str, address: str) -> dict:
+        if kind == "features":
+            return {"address": validate_address(address), "features": self.features(address)}
+        return self.score(address)
+
+    def run_batch(self, kind: str, addresses: list[str]):
+        """Yields results in completion order so they can be streamed."""
+        futures = {self._executor.submit(self.run, kind, address): address for address in addresses}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                yield {"address": futures[future], "error": str(e)}
+
+    def health(self) -> dict:
+        return {
+            "providers": self.client.report(),
+            "cached_features": len(self.features_cache),
+            "cached_scores": len(self.scores_cache),
+        }
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    ROUTES = {"/features": "features", "/score": "score"}
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._send_json(404, {"error": "Not found"})
+        self._send_json(200, self.server.service.health())
+
+    def do_POST(self):
+        kind = self.ROUTES.get(self.path)
+        if kind is None:
+            return self._send_json(404, {"error": "Not found"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError as e:
+            return self._send_json(400, {"error": f"Invalid JSON: {e}"})
+
+        service = self.server.service
+        if "addresses" in body:
+            return self._stream(service.run_batch(kind, body["addresses"]))
+        if "address" not in body:
+            return self._send_json(400, {"error": "Expected 'address' or 'addresses'"})
+        try:
+            self._send_json(200, service.run(kind, body["address"]))
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            logging.error(f"Error handling {self.path} for {body['address']}: {e}")
+            self._send_json(502, {"error": str(e)})
+
+    def _send_json(self, status: int, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, results):
+        """Writes one NDJSON line per result using chunked transfer encoding."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for result in results:
+            line = (json.dumps(result) + "\n").encode()
+            self.wfile.write(f"{len(line):X}\r\n".encode() + line + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def address_string(self):
+        # Unix sockets have no peer address
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        logging.debug("%s - %s", self.address_string(), format % args)
+
+
+class ScoringHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service: ScoringService):
+        super().__init__(address, ScoringHandler)
+        self.service = service
+
+
+class ScoringUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, service: ScoringService):
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, ScoringHandler)
+        self.service = service
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident wallet feature and sybil scoring service")
+    parser.add_argument("--config", default="config/config.yaml", help="Path to config file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--unix-socket", help="Listen on a Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent wallets per batch")
+    parser.add_argument("--cache-ttl", type=float, default=600.0, help="Seconds to keep computed results")
+    parser.add_argument("--no-detector", action="store_true", help="Serve /features only, skip loading the detector")
+    parser.add_argument("--store", help="SQLite result store for verdicts")
+    parser.add_argument("--store-ttl-hours", type=float, help="Serve stored verdicts younger than this without re-scoring")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    with open(args.config) as f:
+        cfg = yaml.safe_load(f)
+
+    store = None
+    if args.store:
+        from result_store import ResultStore
+        store = ResultStore(args.store)
+    store_ttl = args.store_ttl_hours * 3600 if args.store_ttl_hours is not None else None
+
+    service = ScoringService(cfg, args.config, args.cache_ttl, args.workers, store=store, store_ttl=store_ttl)
+    if not args.no_detector:
+        service.load_detector()
+
+    if args.unix_socket:
+        server = ScoringUnixServer(args.unix_socket, service)
+        logging.info(f"Scoring service listening on unix:{args.unix_socket}")
+    else:
+        server = ScoringHTTPServer((args.host, args.port), service)
+        logging.info(f"Scoring service listening on http://{args.host}:{args.port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+import argparse
+import hashlib
+import math
+import random
+import time
+import tracemalloc
+from bisect import bisect_left, bisect_right
+from feature_extractor import RunningStats, avg_interval_hours
+
+QUANTILES = (50, 90, 99)
+
+
+class HyperLogLog:
+    """Distinct counter in 2**p one-byte registers.
+
+    Standard error is about 1.04 / sqrt(2**p): ~1.6% at the default p=12,
+    using 4 KB regardless of how many items are added.
+    """
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+        self.alpha = 0.7213 / (1 + 1.079 / self.m)
+
+    def add(self, item: str):
+        h = int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest(), 'big')
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self) -> int:
+        estimate = self.alpha * self.m * self.m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+
+class KLLSketch:
+    """Streaming quantile sketch (KLL compactor hierarchy).
+
+    Keeps O(k) items; the rank error of a quantile query is roughly 1.7 / k
+    (about 1% at the default k=200).
+    """
+
+    def __init__(self, k: int = 200, seed: int = None):
+        self.k = k
+        self.n = 0
+        self.compactors = []
+        self.size = 0
+        self.max_size = 0
+        self._rng = random.Random(seed)
+        self._grow()
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(self.k * (2 / 3) ** depth)) + 1
+
+    def _grow(self):
+        self.compactors.append([])
+        self.max_size = sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def add(self, value: float):
+        self.compactors[0].append(value)
+        self.size += 1
+        self.n += 1
+        if self.size >= self.max_size:
+            self._compress()
+
+    def _compress(self):
+        for level, items in enumerate(self.compactors):
+            if len(items) < self._capacity(level):
+                continue
+            if level + 1 == len(self.compactors):
+                self._grow()
+            items.sort()
+            kept = [items.pop()] if len(items) % 2 else []
+            promoted = items[self._rng.random() < 0.5::2]
+            self.compactors[level + 1].extend(promoted)
+            self.compactors[level] = kept
+            self.size = sum(len(c) for c in self.compactors)
+            return
+
+    def quantile(self, q: float) -> float:
+        weighted = sorted((value, 1 << level) for level, items in enumerate(self.compactors) for value in items)
+        if not weighted:
+            return 0
+        total = sum(weight for _, weight in weighted)
+        target, seen = q * total, 0
+        for value, weight in weighted:
+            seen += weight
+            if seen >= target:
+                return value
+        return weighted[-1][0]
+
+
+class SpaceSaving:
+    """Top-k heavy hitters with at most `k` counters.
+
+    While at most `k` distinct items have been seen this is an exact counter.
+    Past that, each new item evicts the smallest counter (an O(k) scan) and
+    inherits its count, so reported counts overestimate the true count by at
+    most n / k, and any item occurring more than n / k times is tracked.
+    """
+
+    def __init__(self, k: int = 64):
+        self.k = k
+        self.n = 0
+        self.counts = {}
+
+    def add(self, item):
+        self.n += 1
+        if item in self.counts:
+            self.counts[item] += 1
+        elif len(self.counts) < self.k:
+            self.counts[item] = 1
+        else:
+            victim = min(self.counts, key=self.counts.get)
+            self.counts[item] = self.counts.pop(victim) + 1
+
+    def top(self, n: int = 1) -> list[tuple]:
+        return sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+
+
+def calculate_features_approx(normal_txs, token_txs, wallet_address, precision: int = 12,
+                              quantile_k: int = 200, max_days: int = 8192):
+    """Single pass over the transfers with constant memory per wallet.
+
+    Same keys as feature_extractor.calculate_features, plus p50/p90/p99 of
+    outgoing ETH values. Inputs can be any iterables, so transfers can be
+    streamed without building a list.
+
+    - Exact: total_transactions, wallet_age_days, transaction_frequency,
+      avg_time_between_txs, outgoing_eth_txs, mean/std of outgoing ETH.
+    - unique_* counts: HyperLogLog, relative standard error
+      1.04 / sqrt(2**precision) (1.6% at precision=12).
+    - Quantiles: KLL, rank error about 1.7 / quantile_k (0.85% at 200).
+    - max_txs_per_day: an exact per-day counter capped at `max_days` entries
+      (8192 days is about 22 years; Ethereum mainnet is about 4,100 days
+      old). Past the cap it degrades to SpaceSaving, with an overestimate of
+      at most total_transactions / max_days.
+    """
+    wallet = wallet_address.lower()
+    recipients, tokens, funders = HyperLogLog(precision), HyperLogLog(precision), HyperLogLog(precision)
+    values = KLLSketch(quantile_k)
+    days = SpaceSaving(max_days)
+    eth = RunningStats()
+    total, outgoing = 0, 0
+    first_ts, last_ts = None, None
+
+    def track(ts):
+        nonlocal total, first_ts, last_ts
+        total += 1
+        first_ts = ts if first_ts is None else min(first_ts, ts)
+        last_ts = ts if last_ts is None else max(last_ts, ts)
+        days.add(ts // 86400)
+
+    for tx in normal_txs:
+        track(int(tx['timeStamp']))
+        sender, recipient = tx['from'].lower(), tx['to'].lower()
+        if recipient == wallet and sender:
+            funders.add(sender)
+        if sender != wallet:
+            continue
+        outgoing += 1
+        if recipient:
+            recipients.add(recipient)
+        value = int(tx.get('value', 0))
+        if value > 0:
+            eth.add(value / 1e18)
+            values.add(value / 1e18)
+
+    for tx in token_txs:
+        track(int(tx['timeStamp']))
+        if tx['contractAddress']:
+            tokens.add(tx['contractAddress'].lower())
+
+    features = {}
+    features['total_transactions'] = total
+    features['unique_contracts'] = recipients.count()
+    features['unique_tokens'] = tokens.count()
+    if total:
+        features['wallet_age_days'] = (int(time.time()) - first_ts) / 86400
+        features['transaction_frequency'] = total / max((last_ts - first_ts) / 86400, 1e-6)
+    else:
+        features['wallet_age_days'] = 0
+        features['transaction_frequency'] = 0
+    features['avg_time_between_txs'] = avg_interval_hours(first_ts, last_ts, total)
+    features['max_txs_per_day'] = days.top(1)[0][1] if total else 0
+    features['unique_funders'] = funders.count()
+    features['outgoing_eth_txs'] = outgoing
+    features['avg_outgoing_eth_value'] = eth.mean if eth.count else 0
+    features['std_outgoing_eth_value'] = RunningStats.stdev_of(eth.count, eth.m2)
+    features['unique_recipients'] = features['unique_contracts']
+    for q in QUANTILES:
+        features[f'outgoing_eth_value_p{q}'] = values.quantile(q / 100) if eth.count else 0
+    return features
+
+
+def synthetic_wallet(transfers: int, seed: int = 0):
+    """Returns (normal, token, address) for a hub wallet; normal()/token() replay the same transfers.
+
+    Counterparties and token contracts are drawn from pools as large as the
+    wallet, so distinct counts run into the hundreds of thousands.
+    """
+    wallet = "0x" + "ab" * 20
+    start = 1_600_000_000
+
+    def address(i):
+        return f"0x{i:040x}"
+
+    def normal():
+        rng = random.Random(seed)
+        for _ in range(transfers // 2):
+            counterparty = address(rng.randrange(transfers))
+            outgoing = rng.random() < 0.5
+            yield {
+                'timeStamp': start + int(rng.random() * 3 * 365 * 86400),
+                'from': wallet if outgoing else counterparty,
+                'to': counterparty if outgoing else wallet,
+                'value': str(int(rng.lognormvariate(40, 2))),
+                'contractAddress': '',
+            }
+
+    def token():
+        rng = random.Random(seed + 1)
+        for _ in range(transfers - transfers // 2):
+            yield {
+                'timeStamp': start + int(rng.random() * 3 * 365 * 86400),
+                'from': wallet,
+                'to': address(rng.randrange(transfers)),
+                'value': '1',
+                'contractAddress': address(transfers + rng.randrange(transfers // 4 or 1)),
+            }
+
+    return normal, token, wallet
+
+
+def exact_quantile_ranks(values: list[float], approx: dict) -> dict[int, float]:
+    """Rank of each approximate quantile within the sorted exact `values`."""
+    ranks = {}
+    for q in QUANTILES:
+        value = approx[f'outgoing_eth_value_p{q}']
+        ranks[q] = (bisect_left(values, value) + bisect_right(values, value)) / 2 / len(values)
+    return ranks
+
+
+def main():
+    from feature_extractor import calculate_features
+
+    parser = argparse.ArgumentParser(description="Check approximate features against exact ones on a synthetic hub wallet")
+    parser.add_argument("--transfers", type=int, default=1_000_000, help="Number of synthetic transfers")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--precision", type=int, default=12, help="HyperLogLog precision")
+    parser.add_argument("--quantile-k", type=int, default=200, help="KLL sketch size")
+    args = parser.parse_args()
+
+    normal, token, wallet = synthetic_wallet(args.transfers, args.seed)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    normal_txs = list(normal())
+    exact = calculate_features(normal_txs, list(token()), wallet)
+    exact_time = time.perf_counter() - started
+    exact_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    eth_values = sorted(int(tx['value']) / 1e18 for tx in normal_txs
+                        if tx['from'] == wallet and int(tx['value']) > 0)
+    del normal_txs
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    approx = calculate_features_approx(normal(), token(), wallet, args.precision, args.quantile_k)
+    approx_time = time.perf_counter() - started
+    approx_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # Documented bounds: 3 standard errors for HyperLogLog, 2 / k rank error for KLL
+    hll_bound = 3 * 1.04 / math.sqrt(2 ** args.precision)
+    rank_bound = 2 / args.quantile_k
+    failures = 0
+
+    def check(name, exact_value, approx_value, error, bound, kind):
+        nonlocal failures
+        ok = error <= bound
+        failures += not ok
+        shown = f"{error:.4f} <= {bound:.4f}" if kind == "days" else f"{error:.3%} <= {bound:.3%}"
+        print(f"{name:<26}{exact_value:>16.4f}{approx_value:>16.4f}  {kind:<6}{shown:>20}  {'PASS' if ok else 'FAIL'}")
+
+    print(f"{'feature':<26}{'exact':>16}{'approx':>16}  {'error':<6}{'bound':>20}")
+    for key, value in exact.items():
+        relative = abs(approx[key] - value) / abs(value) if value else abs(approx[key])
+        if key in ('unique_contracts', 'unique_tokens', 'unique_funders', 'unique_recipients'):
+            check(key, value, approx[key], relative, hll_bound, "rel")
+        elif key == 'wallet_age_days':
+            # Both sides read the clock; allow the minutes between the two runs
+            check(key, value, approx[key], abs(approx[key] - value), 0.01, "days")
+        else:
+            check(key, value, approx[key], relative, 1e-9, "exact")
+    for q, rank in exact_quantile_ranks(eth_values, approx).items():
+        exact_value = eth_values[max(math.ceil(q / 100 * len(eth_values)) - 1, 0)]
+        check(f'outgoing_eth_value_p{q}', exact_value, approx[f'outgoing_eth_value_p{q}'],
+              abs(rank - q / 100), rank_bound, "rank")
+
+    print(f"exact:  {exact_time:.1f}s, peak {exact_peak / 2**20:.1f} MiB (transfers materialized and sorted)")
+    print(f"approx: {approx_time:.1f}s, peak {approx_peak / 2**20:.2f} MiB (streamed)")
+    if failures:
+        print(f"{failures} checks outside their documented bounds")
+        raise SystemExit(1)
+    print("All features within their documented bounds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).parent
+
+# module -> (max cold import seconds, max modules newly loaded by the import)
+BUDGETS = {
+    "main": (0.15, 80),
+    "wallet_network_analyzer": (0.15, 90),
+    "sybil_detection": (0.15, 60),
+}
+
+PROBE = (
+    "import sys, time; n = len(sys.modules); t = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - t, len(sys.modules) - n)"
+)
+
+
+def measure(module: str, repeats: int = 5) -> tuple[float, int]:
+    """Best-of-N cold import time (fresh interpreter each run) and modules it loaded."""
+    best_time, modules = float("inf"), 0
+    for _ in range(repeats):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module)],
+            cwd=SRC_DIR, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        elapsed, count = float(out[0]), int(out[1])
+        if elapsed < best_time:
+            best_time, modules = elapsed, count
+    return best_time, modules
+
+
+def check_budgets(budgets: dict = BUDGETS, repeats: int = 5) -> dict[str, dict]:
+    results = {}
+    for module, (max_time, max_modules) in budgets.items():
+        elapsed, modules = measure(module, repeats)
+        results[module] = {
+            "import_seconds": round(elapsed, 4),
+            "modules": modules,
+            "ok": elapsed <= max_time and modules <= max_modules,
+            "budget": {"import_seconds": max_time, "modules": max_modules},
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check CLI cold-start import time against a budget")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per module")
+    args = parser.parse_args()
+
+    results = check_budgets(repeats=args.repeats)
+    print(json.dumps(results, indent=2))
+    failed = [module for module, result in results.items() if not result["ok"]]
+    if failed:
+        print(f"Startup budget exceeded: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
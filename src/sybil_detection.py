@@ -2,35 +2,62 @@ import os
 import json
 import yaml
 import re
+import time
 from pathlib import Path
-import openai
-from jinja2 import Template
+
+# openai and jinja2 are imported lazily so that `--help` and callers that only
+# construct prompts do not pay for the OpenAI client import.
+
+SYSTEM_PROMPT = "You are a blockchain analyst specializing in sybil detection."
+
+# Column order of the wallet table in packed mode
+FEATURE_COLUMNS = [
+    "total_transactions", "unique_contracts", "unique_tokens", "wallet_age_days",
+    "transaction_frequency", "avg_time_between_txs", "max_txs_per_day", "unique_funders",
+    "outgoing_eth_txs", "avg_outgoing_eth_value", "std_outgoing_eth_value", "unique_recipients",
+]
+
 
 class SybilDetector:
+    model = "gpt-4.1-mini"
+
     def __init__(self, config_path: str = "../config/config.yaml"):
         self.project_root = Path(__file__).parent.parent
         self.config_path = self.project_root / config_path.lstrip("./")
         self.prompt_path = self.project_root / "prompts/is_sybil.txt"
+        self.batch_prompt_path = self.project_root / "prompts/is_sybil_batch.txt"
+        self.usage = {}
         self.load_config()
         self.load_prompt_template()
 
     def load_config(self):
+        self.api_key = os.getenv("OPENAI_API_KEY")
         try:
             with open(self.config_path, 'r') as f:
                 self.config = yaml.safe_load(f)
 
-            openai.api_key = os.getenv("OPENAI_API_KEY")
-            if not openai.api_key and 'openai_api_key' in self.config:
-                openai.api_key = self.config['openai_api_key']
+            if not self.api_key and 'openai_api_key' in self.config:
+                self.api_key = self.config['openai_api_key']
                 
-            if not openai.api_key:
+            if not self.api_key:
                 print("Warning: No OpenAI API key found in config or environment variables.")
                 print("Please set OPENAI_API_KEY environment variable or add 'openai_api_key' to config.yaml")
         except Exception as e:
             print(f"Error loading config: {e}")
             self.config = {}
 
+    def _openai(self):
+        """The configured OpenAI module, imported on the first request."""
+        if not self.api_key:
+            raise ValueError("OpenAI API key not configured")
+        import openai
+
+        openai.api_key = self.api_key
+        return openai
+
     def load_prompt_template(self):
+        from jinja2 import Template
+
         try:
             with open(self.prompt_path, 'r') as f:
                 self.prompt_template = Template(f.read())
@@ -38,6 +65,13 @@ class SybilDetector:
             print(f"Error loading prompt template: {e}")
             self.prompt_template = None
 
+        try:
+            with open(self.batch_prompt_path, 'r') as f:
+                self.batch_instructions = f.read()
+        except Exception as e:
+            print(f"Error loading batch prompt: {e}")
+            self.batch_instructions = None
+
     def format_prompt(self, wallet_address: str, features: dict[str]) -> str:
         if not self.prompt_template:
             raise ValueError("Prompt template not loaded")
@@ -48,19 +82,21 @@ class SybilDetector:
         return self.prompt_template.render(**features_with_address)
 
     def detect_sybil(self, wallet_address: str, features: dict[str]) -> int:
-        if not openai.api_key:
-            raise ValueError("OpenAI API key not configured")
+        """Returns 1 (sybil) or 0, or None when the reply has no parseable verdict."""
+        openai = self._openai()
         
         prompt = self.format_prompt(wallet_address, features)
         
+        started = time.perf_counter()
         response = openai.chat.completions.create(
-            model="gpt-4.1-mini",
+            model=self.model,
             messages=[
-                {"role": "system", "content": "You are a blockchain analyst specializing in sybil detection."},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.1,
         )
+        self._record_usage("single", response, 1, time.perf_counter() - started)
         
         response_text = response.choices[0].message.content.strip()
         
@@ -75,18 +111,205 @@ class SybilDetector:
                 return is_sybil
             
             print(f"Warning: Could not parse response for wallet {wallet_address}: {response_text}")
-            return 0
+            return None
+
+    def format_batch_table(self, wallets: dict[str, dict[str]]) -> str:
+        def fmt(value):
+            return f"{value:.6g}" if isinstance(value, float) else str(value)
+
+        rows = [",".join(["wallet_address"] + FEATURE_COLUMNS)]
+        for wallet_address, features in wallets.items():
+            rows.append(",".join([wallet_address] + [fmt(features.get(col, "")) for col in FEATURE_COLUMNS]))
+        return "\n".join(rows)
+
+    def parse_batch_response(self, response_text: str, pending: dict[str, str]) -> dict[str, int]:
+        """Maps strict JSON verdicts back to addresses; unknown or malformed entries are dropped."""
+        if not isinstance(response_text, str):
+            # Refusals and empty completions come back with content=None
+            print(f"Warning: Packed response has no content: {response_text!r}")
+            return {}
+        try:
+            verdicts = json.loads(response_text).get("verdicts", [])
+        except (ValueError, AttributeError):
+            print(f"Warning: Could not parse packed response: {response_text[:200]}")
+            return {}
 
-    def process_wallets(self, wallets_data: dict[str, dict[str]], output_path: str = None) -> dict[str, int]:
         results = {}
-        
-        for wallet_address, features in wallets_data.items():
-            print(f"Processing wallet: {wallet_address}")
+        for verdict in verdicts if isinstance(verdicts, list) else []:
+            if not isinstance(verdict, dict):
+                continue
+            wallet_address = pending.get(str(verdict.get("wallet_address", "")).lower())
+            is_sybil = verdict.get("is_sybil")
+            if wallet_address and not isinstance(is_sybil, bool) and is_sybil in (0, 1):
+                results[wallet_address] = int(is_sybil)
+        return results
+
+    def detect_sybil_batch(self, wallets: dict[str, dict[str]], max_rounds: int = 3,
+                           on_verdicts=None) -> dict[str, int]:
+        """Scores several wallets per request.
+
+        The instructions are sent as an identical prefix on every request so
+        the provider can cache them; only the wallet table changes. Wallets
+        whose verdict is missing or malformed, or whose request failed, are
+        re-queued for up to `max_rounds` requests. `on_verdicts` is called
+        with each round's verdicts as they arrive.
+        """
+        openai = self._openai()
+        if not self.batch_instructions:
+            raise ValueError("Batch prompt not loaded")
+
+        results = {}
+        remaining = dict(wallets)
+        for _ in range(max_rounds):
+            if not remaining:
+                break
+            started = time.perf_counter()
             try:
-                is_sybil = self.detect_sybil(wallet_address, features)
-                results[wallet_address] = is_sybil
+                response = openai.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": self.batch_instructions},
+                        {"role": "user", "content": self.format_batch_table(remaining)}
+                    ],
+                    temperature=0.1,
+                    response_format={"type": "json_object"},
+                )
             except Exception as e:
-                print(f"Error processing wallet {wallet_address}: {e}")
+                print(f"Packed request for {len(remaining)} wallets failed: {e}")
+                continue
+            elapsed = time.perf_counter() - started
+
+            pending = {wallet_address.lower(): wallet_address for wallet_address in remaining}
+            verdicts = self.parse_batch_response(response.choices[0].message.content, pending)
+            self._record_usage("packed", response, len(verdicts), elapsed)
+            results.update(verdicts)
+            if verdicts and on_verdicts is not None:
+                on_verdicts(verdicts)
+            remaining = {k: v for k, v in remaining.items() if k not in verdicts}
+            if remaining:
+                print(f"Re-queueing {len(remaining)} wallets without a valid verdict")
+
+        if remaining:
+            print(f"Warning: No verdict after {max_rounds} rounds for: {', '.join(remaining)}")
+        return results
+
+    def _record_usage(self, mode: str, response, wallets: int, seconds: float):
+        stats = self.usage.setdefault(mode, {
+            "requests": 0, "wallets": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0
+        })
+        usage = getattr(response, "usage", None)
+        stats["requests"] += 1
+        stats["wallets"] += wallets
+        stats["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+        stats["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+        stats["seconds"] += seconds
+
+    def usage_report(self) -> dict[str, dict]:
+        report = {}
+        for mode, stats in self.usage.items():
+            wallets = max(stats["wallets"], 1)
+            report[mode] = {
+                **stats,
+                "tokens_per_wallet": (stats["prompt_tokens"] + stats["completion_tokens"]) / wallets,
+                "wallets_per_second": stats["wallets"] / stats["seconds"] if stats["seconds"] else 0,
+            }
+        return report
+
+    def compare_modes(self, wallets_data: dict[str, dict[str]], sample_size: int = 20,
+                      batch_size: int = 10) -> dict:
+        """Scores the same sample one wallet per request and packed, side by side.
+
+        Returns the usage report of both modes on the sample plus the share of
+        wallets on which their verdicts agree. Wallets without a parseable
+        verdict in either mode are left out of the agreement.
+        """
+        sample = list(wallets_data.items())[:sample_size]
+        saved, self.usage = self.usage, {}
+        try:
+            single = {}
+            for wallet_address, features in sample:
+                try:
+                    is_sybil = self.detect_sybil(wallet_address, features)
+                except Exception as e:
+                    print(f"Error processing wallet {wallet_address}: {e}")
+                    continue
+                if is_sybil is not None:
+                    single[wallet_address] = is_sybil
+            packed = {}
+            for i in range(0, len(sample), batch_size):
+                packed.update(self.detect_sybil_batch(dict(sample[i:i + batch_size])))
+            report = self.usage_report()
+        finally:
+            self.usage = saved
+
+        both = [wallet_address for wallet_address in single if wallet_address in packed]
+        report["agreement"] = sum(single[a] == packed[a] for a in both) / len(both) if both else None
+        return report
+
+    @staticmethod
+    def format_comparison(report: dict) -> str:
+        lines = [f"{'mode':<8}{'wallets':>9}{'requests':>10}{'tokens/wallet':>15}{'wallets/s':>11}"]
+        for mode in ("single", "packed"):
+            stats = report.get(mode)
+            if stats:
+                lines.append(f"{mode:<8}{stats['wallets']:>9}{stats['requests']:>10}"
+                             f"{stats['tokens_per_wallet']:>15.0f}{stats['wallets_per_second']:>11.2f}")
+        if report.get("agreement") is not None:
+            lines.append(f"Verdict agreement: {report['agreement']:.0%}")
+        return "\n".join(lines)
+
+    def _store_verdicts(self, store, verdicts: dict[str, int], wallets_data: dict[str, dict[str]]):
+        if store is None or not verdicts:
+            return
+        store.upsert_many([
+            {"address": wallet_address, "features": wallets_data[wallet_address], "verdict": is_sybil,
+             "score": float(is_sybil), "model": self.model}
+            for wallet_address, is_sybil in verdicts.items()
+        ])
+
+    def process_wallets(self, wallets_data: dict[str, dict[str]], output_path: str = None,
+                        batch_size: int = 1, store=None, ttl: float = None) -> dict[str, int]:
+        """Scores wallets; with a ResultStore, verdicts are upserted as they arrive
+        and wallets scored within the last `ttl` seconds are not re-scored."""
+        results = {}
+
+        if store is not None and ttl is not None:
+            fresh = store.fresh(wallets_data, ttl)
+            for wallet_address in wallets_data:
+                record = fresh.get(wallet_address.lower())
+                if record is not None and record["verdict"] is not None:
+                    results[wallet_address] = record["verdict"]
+            if results:
+                print(f"Skipping {len(results)} wallets scored within the last {ttl:.0f}s")
+        pending = {k: v for k, v in wallets_data.items() if k not in results}
+        
+        if batch_size > 1:
+            items = list(pending.items())
+            for i in range(0, len(items), batch_size):
+                batch = dict(items[i:i + batch_size])
+                print(f"Processing batch of {len(batch)} wallets ({i + len(batch)}/{len(items)})")
+                try:
+                    verdicts = self.detect_sybil_batch(
+                        batch, on_verdicts=lambda v: self._store_verdicts(store, v, wallets_data))
+                    results.update(verdicts)
+                except Exception as e:
+                    print(f"Error processing batch starting at {items[i][0]}: {e}")
+        else:
+            for wallet_address, features in pending.items():
+                print(f"Processing wallet: {wallet_address}")
+                try:
+                    is_sybil = self.detect_sybil(wallet_address, features)
+                    if is_sybil is None:
+                        continue
+                    results[wallet_address] = is_sybil
+                    self._store_verdicts(store, {wallet_address: is_sybil}, wallets_data)
+                except Exception as e:
+                    print(f"Error processing wallet {wallet_address}: {e}")
+
+        for mode, stats in self.usage_report().items():
+            print(f"[{mode}] {stats['wallets']} wallets in {stats['requests']} requests: "
+                  f"{stats['tokens_per_wallet']:.0f} tokens/wallet, {stats['wallets_per_second']:.2f} wallets/s")
         
         if output_path:
             self.save_results(results, output_path)
@@ -107,17 +330,35 @@ def main():
     
     parser = argparse.ArgumentParser(description='Detect sybil wallets using OpenAI API')
     parser.add_argument('--input', '-i', required=True, help='Input JSON file with wallet features')
-    parser.add_argument('--output', '-o', required=True, help='Output JSON file for results')
+    parser.add_argument('--output', '-o', help='Output JSON file for results')
     parser.add_argument('--config', '-c', default='config/config.yaml', help='Config file path')
+    parser.add_argument('--batch-size', '-b', type=int, default=1, help='Wallets per request (packed mode when > 1)')
+    parser.add_argument('--store', help='SQLite result store to upsert verdicts into')
+    parser.add_argument('--ttl-hours', type=float, help='Skip wallets in the store scored within this many hours')
+    parser.add_argument('--compare', type=int, metavar='N',
+                        help='Score the first N wallets in both single and packed mode and report side by side')
     
     args = parser.parse_args()
+    if not args.output and not args.compare:
+        parser.error("--output is required unless --compare is given")
     
     detector = SybilDetector(config_path=args.config)
     
     with open(args.input, 'r') as f:
         wallets_data = json.load(f)
+
+    if args.compare:
+        report = detector.compare_modes(wallets_data, args.compare, max(args.batch_size, 2))
+        print(detector.format_comparison(report))
+        return
     
-    detector.process_wallets(wallets_data, args.output)
+    store = None
+    if args.store:
+        from result_store import ResultStore
+        store = ResultStore(args.store)
+    ttl = args.ttl_hours * 3600 if args.ttl_hours is not None else None
+
+    detector.process_wallets(wallets_data, args.output, args.batch_size, store, ttl)
 
 
 if __name__ == "__main__":
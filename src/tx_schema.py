@@ -0,0 +1,41 @@
+from datetime import datetime
+
+# Единая схема транзакции (поля в стиле Etherscan), общая для всех провайдеров:
+# hash, blockNumber, timeStamp, from, to, value, contractAddress
+
+
+def _lower(value) -> str:
+    return (value or '').lower()
+
+
+def normalize_etherscan_tx(tx: dict) -> dict:
+    """Приводит транзакцию Etherscan к единой схеме."""
+    return {
+        'hash': tx.get('hash', ''),
+        'blockNumber': int(tx.get('blockNumber') or 0),
+        'timeStamp': int(tx.get('timeStamp') or 0),
+        'from': _lower(tx.get('from')),
+        'to': _lower(tx.get('to')),
+        'value': str(tx.get('value') or 0),
+        'contractAddress': _lower(tx.get('contractAddress')),
+    }
+
+
+def parse_moralis_timestamp(ts) -> int:
+    if not ts:
+        return 0
+    dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    return int(dt.timestamp())
+
+
+def normalize_moralis_tx(tx: dict, token: bool = False) -> dict:
+    """Приводит транзакцию или ERC-20 трансфер Moralis к единой схеме."""
+    return {
+        'hash': tx.get('transaction_hash') or tx.get('hash', ''),
+        'blockNumber': int(tx.get('block_number') or 0),
+        'timeStamp': parse_moralis_timestamp(tx.get('block_timestamp')),
+        'from': _lower(tx.get('from_address')),
+        'to': _lower(tx.get('to_address')),
+        'value': str(tx.get('value') or 0),
+        'contractAddress': _lower(tx.get('token_address') or tx.get('address')) if token else '',
+    }
@@ -1,20 +1,13 @@
 import json
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
-from sklearn.preprocessing import StandardScaler
-from sklearn.cluster import KMeans
-from sklearn.decomposition import PCA
 from pathlib import Path
-import dash
-from dash import dcc
-from dash import html
-from dash.dependencies import Input, Output
 import webbrowser
 from threading import Timer
 
+# matplotlib, plotly, dash and sklearn are imported inside the functions that
+# use them: together they take seconds to load and most callers need none.
+
 def load_wallet_data(json_file_path):
     print(f"Loading wallet data from {json_file_path}")
     with open(json_file_path, 'r') as f:
@@ -31,6 +24,8 @@ def load_wallet_data(json_file_path):
     return df
 
 def scale_features(df):
+    from sklearn.preprocessing import StandardScaler
+
     print("Scaling features...")
     features_to_scale = df.drop('target', axis=1, errors='ignore')
     scaler = StandardScaler()
@@ -39,12 +34,18 @@ def scale_features(df):
     return scaled_features, scaler
 
 def cluster_wallets(scaled_data, n_clusters=5):
+    from sklearn.cluster import KMeans
+
     print(f"Clustering wallets into {n_clusters} groups...")
     kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
     cluster_labels = kmeans.fit_predict(scaled_data)
     return cluster_labels
 
 def visualize_clusters(scaled_data, cluster_labels, wallet_addresses, output_path, df_original):
+    import matplotlib.pyplot as plt
+    import plotly.express as px
+    from sklearn.decomposition import PCA
+
     print("Reducing dimensionality for visualization...")
     pca = PCA(n_components=2)
     reduced_data = pca.fit_transform(scaled_data)
@@ -126,6 +127,10 @@ def visualize_clusters(scaled_data, cluster_labels, wallet_addresses, output_pat
     return viz_df
 
 def get_optimal_clusters(scaled_data, max_clusters=15):
+    import matplotlib.pyplot as plt
+    import plotly.express as px
+    from sklearn.cluster import KMeans
+
     print("Determining optimal number of clusters...")
     inertia_values = []
     
@@ -176,6 +181,13 @@ def get_optimal_clusters(scaled_data, max_clusters=15):
     return optimal_k, inertia_values
 
 def create_dash_app(df_with_clusters, viz_df, cluster_stats, inertia_values):
+    import dash
+    import plotly.express as px
+    from dash import dcc, html
+    from dash.dependencies import Input, Output
+    from sklearn.decomposition import PCA
+    from sklearn.preprocessing import StandardScaler
+
     print("Setting up Dash application...")
     app = dash.Dash(__name__, 
                    external_stylesheets=[
@@ -321,7 +333,23 @@ def create_dash_app(df_with_clusters, viz_df, cluster_stats, inertia_values):
     
     return app
 
+def store_clusters(store_path, wallet_addresses, cluster_labels):
+    from result_store import ResultStore
+
+    with ResultStore(store_path) as store:
+        store.upsert_many([
+            {"address": address, "cluster": int(cluster)}
+            for address, cluster in zip(wallet_addresses, cluster_labels)
+        ])
+    print(f"Cluster ids upserted into {store_path}")
+
 def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Cluster wallets by their features")
+    parser.add_argument("--store", help="SQLite result store to upsert cluster ids into")
+    args = parser.parse_args()
+
     base_path = Path(__file__).parent.parent.absolute()
     json_file_path = base_path / "wn.json"
     output_path = base_path / "wallet_clusters.png"
@@ -340,6 +368,8 @@ def main():
     n_clusters = optimal_k
     
     cluster_labels = cluster_wallets(scaled_data, n_clusters)
+    if args.store:
+        store_clusters(args.store, wallet_addresses, cluster_labels)
     
     viz_df = visualize_clusters(scaled_data, cluster_labels, wallet_addresses, output_path, df)
     
@@ -5,7 +5,7 @@ import yaml
 import time
 import os
 from collections import deque
-from data_fetcher import EtherscanClient
+from concurrent.futures import ThreadPoolExecutor
 from feature_extractor import calculate_features
 from utils import validate_address
 
@@ -13,10 +13,9 @@ from utils import validate_address
 def load_config(path="config/config.yaml"):
     with open(path) as f:
         cfg = yaml.safe_load(f)
-    try:
-        return cfg['etherscan_api_key']
-    except KeyError:
+    if 'etherscan_api_key' not in cfg:
         raise KeyError("Config missing 'etherscan_api_key'")
+    return cfg
 
 
 def get_related_wallets(normal_txs: list[dict], token_txs: list[dict], address: str) -> set[str]:
@@ -38,45 +37,64 @@ def get_related_wallets(normal_txs: list[dict], token_txs: list[dict], address:
     return {w for w in related_wallets if len(w) == 42}
 
 
-def analyze_wallet_network(initial_address: str, max_wallets: int = 100, api_key: str = None) -> dict[str, dict]:
-    client = EtherscanClient(api_key)
+def analyze_wallet_network(initial_address: str, max_wallets: int = 100, api_key: str = None,
+                           client=None, workers: int = 1, edges=None, store=None) -> dict[str, dict]:
+    # `edges` (network_features.EdgeList) collects crawled transfers for neighbor features;
+    # `store` (result_store.ResultStore) receives each batch's features as soon as it is done
+    if client is None:
+        from data_fetcher import EtherscanClient
+        from providers import EtherscanProvider, ProviderPool
+        client = ProviderPool([EtherscanProvider(EtherscanClient(api_key))])
     wallet_features = {}
     processed_wallets = set()
     wallet_queue = deque([initial_address])
-    
-    while wallet_queue and len(processed_wallets) < max_wallets:
-        current_address = wallet_queue.popleft()
-        
-        if current_address.lower() in processed_wallets:
-            continue
-            
-        try:
-            logging.info(f"Analyzing wallet: {current_address} ({len(processed_wallets) + 1}/{max_wallets})")
-            
-            normal_txs = client.fetch_normal_transactions(current_address)
-            token_txs = client.fetch_token_transfers(current_address)
-            
-            features = calculate_features(normal_txs, token_txs, current_address)
-            wallet_features[current_address] = features
-            processed_wallets.add(current_address.lower())
-            
-            related_wallets = get_related_wallets(normal_txs, token_txs, current_address)
-            
-            # Add new wallets to the queue
-            for wallet in related_wallets:
-                if wallet.lower() not in processed_wallets:
-                    try:
-                        validated_address = validate_address(wallet)
-                        wallet_queue.append(validated_address)
-                    except ValueError:
-                        logging.warning(f"Invalid address format: {wallet}")
-            
+
+    def analyze(address):
+        txs = client.fetch_wallet(address)
+        features = calculate_features(txs['normal'], txs['token'], address)
+        return features, get_related_wallets(txs['normal'], txs['token'], address), txs
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while wallet_queue and len(processed_wallets) < max_wallets:
+            batch = []
+            batch_size = min(workers, max_wallets - len(processed_wallets))
+            while wallet_queue and len(batch) < batch_size:
+                current_address = wallet_queue.popleft()
+                if current_address.lower() in processed_wallets:
+                    continue
+                processed_wallets.add(current_address.lower())
+                batch.append(current_address)
+                logging.info(f"Analyzing wallet: {current_address} ({len(processed_wallets)}/{max_wallets})")
+
+            futures = [executor.submit(analyze, address) for address in batch]
+            batch_features = {}
+            for current_address, future in zip(batch, futures):
+                try:
+                    features, related_wallets, txs = future.result()
+                except Exception as e:
+                    logging.error(f"Error processing wallet {current_address}: {e}")
+                    continue
+
+                wallet_features[current_address] = features
+                batch_features[current_address] = features
+                if edges is not None:
+                    edges.add_transactions(txs['normal'])
+                    edges.add_transactions(txs['token'])
+
+                # Add new wallets to the queue
+                for wallet in related_wallets:
+                    if wallet.lower() not in processed_wallets:
+                        try:
+                            validated_address = validate_address(wallet)
+                            wallet_queue.append(validated_address)
+                        except ValueError:
+                            logging.warning(f"Invalid address format: {wallet}")
+
+            if store is not None and batch_features:
+                store.upsert_many([{"address": a, "features": f} for a, f in batch_features.items()])
+
             time.sleep(0.5)
-            
-        except Exception as e:
-            logging.error(f"Error processing wallet {current_address}: {e}")
-            processed_wallets.add(current_address.lower())
-    
+
     return wallet_features
 
 
@@ -86,12 +104,17 @@ def main():
     parser.add_argument("--max-wallets", type=int, default=100, help="Maximum number of wallets to analyze")
     parser.add_argument("--output", default="wallet_network.json", help="Output JSON file path")
     parser.add_argument("--config", default="config/config.yaml", help="Path to config file")
+    parser.add_argument("--workers", type=int, default=1, help="Number of wallets fetched concurrently")
+    parser.add_argument("--neighbor-features", action="store_true", help="Add sparse neighbor-aggregated features")
+    parser.add_argument("--scores", help="JSON of address -> sybil score to propagate over the network")
+    parser.add_argument("--edges-output", help="Save the crawled transfer edges (.npz)")
+    parser.add_argument("--store", help="SQLite result store to upsert wallet features into")
     args = parser.parse_args()
 
     logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
     try:
-        api_key = load_config(args.config)
+        cfg = load_config(args.config)
         address = validate_address(args.address)
     except Exception as e:
         logging.error(f"Configuration error: {e}")
@@ -99,10 +122,42 @@ def main():
 
     try:
         logging.info(f"Starting recursive wallet analysis from {address} with max {args.max_wallets} wallets")
-        wallet_features = analyze_wallet_network(address, args.max_wallets, api_key)
+        from providers import create_provider_pool
+
+        # Two endpoints per wallet, each of which may be hedged to a second provider
+        client = create_provider_pool(cfg, max_workers=max(8, 4 * args.workers))
+        edges = None
+        if args.neighbor_features or args.edges_output:
+            from network_features import EdgeList
+            edges = EdgeList()
+        store = None
+        if args.store:
+            from result_store import ResultStore
+            store = ResultStore(args.store)
+        wallet_features = analyze_wallet_network(address, args.max_wallets, client=client,
+                                                 workers=args.workers, edges=edges, store=store)
+        logging.info(f"Provider stats: {client.report()}")
+
+        if args.edges_output:
+            edges.save(args.edges_output)
+            logging.info(f"Saved {len(edges)} edges to {args.edges_output}")
+        if args.neighbor_features:
+            from network_features import add_neighbor_features
+            scores = None
+            if args.scores:
+                with open(args.scores) as f:
+                    scores = json.load(f)
+            wallet_features = add_neighbor_features(wallet_features, edges, scores)
         
         with open(args.output, 'w', encoding='utf-8') as f:
             json.dump(wallet_features, f, indent=2)
+
+        if store is not None:
+            if args.neighbor_features:
+                # Neighbor features are only known once the whole network is crawled
+                store.upsert_many([{"address": a, "features": f} for a, f in wallet_features.items()])
+            store.close()
+            logging.info(f"Features upserted into {args.store}")
         
         logging.info(f"Analysis complete. Processed {len(wallet_features)} wallets.")
         logging.info(f"Results saved to {os.path.abspath(args.output)}")